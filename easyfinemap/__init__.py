@@ -1,24 +1,47 @@
 """Top-level package for easy_finemap."""
 
+import importlib
 import logging
 
-from rich.logging import RichHandler
-
-from .easyfinemap import EasyFinemap
-from .ldref import LDRef
-from .loci import Loci
-from .plots import locus_plot
-
 # from .sumstat import SumStat
 
 __author__ = """Jianhua Wang"""
 __email__ = 'jianhua.mert@gmail.com'
 __version__ = '0.4.6'
 
+__all__ = ["EasyFinemap", "LDRef", "Loci", "locus_plot", "configure_logging"]
+
+# public objects and the submodules they live in, imported on first access
+_LAZY_IMPORTS = {
+    "EasyFinemap": ".easyfinemap",
+    "LDRef": ".ldref",
+    "Loci": ".loci",
+    "locus_plot": ".plots",
+}
+
+
+def __getattr__(name):
+    """Import the public objects lazily, so `import easyfinemap` does not load pandas or matplotlib."""
+    if name in _LAZY_IMPORTS:
+        module = importlib.import_module(_LAZY_IMPORTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def configure_logging(level: int = logging.WARNING) -> None:
+    """
+    Configure the root logger with a rich handler.
+
+    Parameters
+    ----------
+    level : int, optional
+        The logging level, by default logging.WARNING
+    """
+    from rich.logging import RichHandler
 
-logging.basicConfig(
-    level=logging.WARNING,
-    format="%(name)s - %(message)s",
-    datefmt="[%X]",
-    handlers=[RichHandler(rich_tracebacks=True, show_path=False)],
-)
+    logging.basicConfig(
+        level=level,
+        format="%(name)s - %(message)s",
+        datefmt="[%X]",
+        handlers=[RichHandler(rich_tracebacks=True, show_path=False)],
+    )
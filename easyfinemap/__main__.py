@@ -0,0 +1,59 @@
+"""Entry point of the easyfinemap command.
+
+`validate-ldref` only shells out to plink, so it is dispatched with argparse without importing typer and rich.
+All other commands, and `--help`, go through the typer app in `easyfinemap.cli`.
+"""
+
+import argparse
+import logging
+import sys
+from typing import List, Optional
+
+FAST_COMMANDS = {"validate-ldref", "validate_ldref"}
+
+
+def _validate_ldref(argv: List[str]) -> None:
+    """
+    Run validate-ldref, the options are the same as `easyfinemap validate-ldref`.
+
+    Parameters
+    ----------
+    argv : List[str]
+        The arguments after the command name.
+    """
+    parser = argparse.ArgumentParser(prog="easyfinemap validate-ldref", description="Validate the LD reference file.")
+    parser.add_argument("ldref_path", help="The path to the LD reference file.")
+    parser.add_argument("outprefix", help="The output prefix.")
+    parser.add_argument("--file-type", "-f", default="plink", help="The file type of the LD reference file.")
+    parser.add_argument("--mac", "-m", type=int, default=10, help="The minor allele count threshold.")
+    parser.add_argument("--threads", "-t", type=int, default=1, help="The number of threads.")
+    args = parser.parse_args(argv)
+
+    from easyfinemap import configure_logging
+    from easyfinemap.ldref import LDRef
+
+    configure_logging(logging.INFO)
+    LDRef().valid(args.ldref_path, args.outprefix, args.file_type, args.mac, args.threads)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the easyfinemap command.
+
+    Parameters
+    ----------
+    argv : Optional[List[str]], optional
+        The command line arguments, by default sys.argv[1:]
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in FAST_COMMANDS and not {"-h", "--help"}.intersection(argv):
+        _validate_ldref(argv[1:])
+        return
+
+    from easyfinemap.cli import app
+
+    app(args=argv, prog_name="easyfinemap")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,17 +4,18 @@ import logging
 import sys
 from enum import Enum
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional, Union
 import os
 
-import pandas as pd
 import typer
-from rich.console import Console
 
-from easyfinemap import __version__
-from easyfinemap.easyfinemap import EasyFinemap
-from easyfinemap.ldref import LDRef
-from easyfinemap.loci import Loci
+from easyfinemap import __version__, configure_logging
+from easyfinemap.constant import ColName
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas and the fine-mapping modules are imported inside the commands, keeping `--help` fast
 
 # from easyfinemap.sumstat import SumStat
 
@@ -26,6 +27,73 @@ app = typer.Typer(context_settings=CONTEXT_SETTINGS, add_completion=False)
 # 4. fine-mapping
 
 
+def _load_sumstats_for_loci(sumstats_path: str, loci: "pd.DataFrame") -> Union[str, "pd.DataFrame"]:
+    """
+    Load the summary statistics within the loci.
+
+    Parquet files are read with one filter per locus, pyarrow skips the row groups whose
+    CHR/BP statistics do not overlap any locus. Feather files are memory-mapped, the rows in the loci
+    are found by binary search of each BP in the merged loci of its chromosome, and only those rows
+    are converted to pandas. Other files are returned as the path, and queried per locus with tabix.
+
+    Parameters
+    ----------
+    sumstats_path : str
+        The path to the GWAS summary statistics file.
+    loci : pd.DataFrame
+        The loci, generated by get-loci command.
+
+    Returns
+    -------
+    Union[str, pd.DataFrame]
+        The summary statistics within the loci, or the path to the tabix-indexed file.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the summary statistics file does not exist.
+    """
+    import pandas as pd
+
+    suffix = Path(sumstats_path).suffix
+    regions = [
+        (int(chrom), int(start), int(end))
+        for chrom, start, end in loci[[ColName.CHR, ColName.START, ColName.END]].itertuples(index=False)
+    ]
+    if suffix in {".parquet", ".pq"}:
+        filters = [
+            [(ColName.CHR, "==", chrom), (ColName.BP, ">=", start), (ColName.BP, "<=", end)]
+            for chrom, start, end in regions
+        ]
+        return pd.read_parquet(sumstats_path, filters=filters)
+    if suffix == ".feather":
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        table = feather.read_table(sumstats_path, memory_map=True)
+        chroms = table.column(ColName.CHR).to_numpy()
+        bps = table.column(ColName.BP).to_numpy()
+        in_loci = np.zeros(len(bps), dtype=bool)
+        for chrom in sorted({chrom for chrom, _, _ in regions}):
+            # merge the overlapping loci, the sorted disjoint intervals are searched once per SNP
+            merged: List[List[int]] = []
+            for start, end in sorted((start, end) for region_chrom, start, end in regions if region_chrom == chrom):
+                if merged and start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            starts, ends = np.array(merged).T
+            on_chrom = np.flatnonzero(chroms == chrom)
+            chrom_bps = bps[on_chrom]
+            interval = np.searchsorted(starts, chrom_bps, side="right") - 1
+            in_loci[on_chrom] = (interval >= 0) & (chrom_bps <= ends[np.maximum(interval, 0)])
+        return table.filter(pa.array(in_loci)).to_pandas()
+    if not os.path.isfile(sumstats_path):
+        raise FileNotFoundError(f"No such file: {sumstats_path}")
+    return sumstats_path
+
+
 class LociMethod(str, Enum):
     """The method to identify the lead SNPs."""
 
@@ -53,11 +121,18 @@ def main(
     verbose: bool = typer.Option(False, '--verbose', '-v', help='Show verbose info.'),
 ):
     """EasyFinemap: A user-friendly tool for fine-mapping."""
-    console = Console()
-    console.rule("[bold blue]EasyFinemap[/bold blue]")
-    console.print(f"Version: {__version__}", justify="center")
-    console.print("Author: Jianhua Wang", justify="center")
-    console.print("Email: jianhua.mert@gmail.com", justify="center")
+    configure_logging()
+    # skip the banner in pipelines, where stdout is not a terminal
+    if sys.stdout.isatty():
+        from rich.console import Console
+
+        console = Console()
+        # buffer the banner and write it to stdout at once
+        with console:
+            console.rule("[bold blue]EasyFinemap[/bold blue]")
+            console.print(f"Version: {__version__}", justify="center")
+            console.print("Author: Jianhua Wang", justify="center")
+            console.print("Email: jianhua.mert@gmail.com", justify="center")
     if version:
         typer.echo(f'EasyFinemap version: {__version__}')
         raise typer.Exit()
@@ -77,6 +152,8 @@ def validate_ldref(
     threads: int = typer.Option(1, "--threads", "-t", help="The number of threads."),
 ) -> None:
     """Validate the LD reference file."""
+    from easyfinemap.ldref import LDRef
+
     ld = LDRef()
     ld.valid(ldref_path, outprefix, file_type, mac, threads)
 
@@ -109,32 +186,38 @@ def get_loci(
     threads: int = typer.Option(1, "--threads", "-t", help="The number of threads."),
 ) -> None:
     """Get the loci from the GWAS summary statistics file."""
-    if sumstats_path.exists():
-        logging.info(f"Loading {sumstats_path}...")
-        sumstats = pd.read_csv(sumstats_path, sep="\t")
-        Loci().identify_indep_loci(
-            sumstats=sumstats,
-            sig_threshold=sig_threshold,
-            loci_extend=loci_extension,
-            ldblock=ldblock,
-            if_merge=if_merge,
-            outprefix=output,
-            ldref=ldref,
-            method=method,
-            distance=distance,
-            clump_kb=clump_kb,
-            clump_r2=clump_r2,
-            sample_size=sample_size,
-            cojo_window_kb=cojo_window_kb,
-            cojo_collinear=cojo_collinear,
-            diff_freq=diff_freq,
-            use_ref_EAF=use_ref_eaf,
-            only_use_sig_snps=only_use_sig_snps,
-            threads=threads,
-        )
-    else:
+    from easyfinemap.loci import Loci
+    from easyfinemap.utils import load_sumstats
+
+    logging.info(f"Loading {sumstats_path}...")
+    # the distance and clumping methods only use the significant SNPs, drop the rest while reading
+    pvalue_threshold = None if method.value == "conditional" else sig_threshold
+    # open the file directly instead of checking that it exists first, one stat less and no race
+    try:
+        sumstats = load_sumstats(sumstats_path, pvalue_threshold)
+    except FileNotFoundError:
         logging.error(f"No such file of {sumstats_path}.")
         sys.exit(1)
+    Loci.identify_indep_loci(
+        sumstats=sumstats,
+        sig_threshold=sig_threshold,
+        loci_extend=loci_extension,
+        ldblock=ldblock,
+        if_merge=if_merge,
+        outprefix=output,
+        ldref=ldref,
+        method=method.value,
+        distance=distance,
+        clump_kb=clump_kb,
+        clump_r2=clump_r2,
+        sample_size=sample_size,
+        cojo_window_kb=cojo_window_kb,
+        cojo_collinear=cojo_collinear,
+        diff_freq=diff_freq,
+        use_ref_EAF=use_ref_eaf,
+        only_use_sig_snps=only_use_sig_snps,
+        threads=threads,
+    )
 
 
 @app.command()
@@ -163,31 +246,37 @@ def fine_mapping(
     threads: int = typer.Option(1, "--threads", "-t", help="The number of threads."),
 ) -> None:
     """Fine mapping."""
-    if os.path.exists(sumstats_path) and os.path.exists(loci_path) and os.path.exists(lead_snps_path):
-        # sumstats = pd.read_csv(sumstats_path, sep="\t")
-        loci = pd.read_csv(loci_path, sep="\t")
-        lead_snps = pd.read_csv(lead_snps_path, sep="\t")
-        EasyFinemap().finemap_all_loci(
-            sumstats=sumstats_path,
-            loci=loci,
-            lead_snps=lead_snps,
-            methods=methods,  # type: ignore
-            outfile=outfile,
-            var_prior=var_prior,
-            conditional=conditional,
-            prior_file=prior_file,
-            sample_size=sample_size,
-            ldref=ldref,
-            cond_snps_wind_kb=cond_snps_wind_kb,
-            max_causal=max_causal,
-            credible_threshold=credible_threshold,
-            credible_method=credible_method,
-            use_ref_EAF=use_ref_EAF,
-            threads=threads,
-        )
-    else:
+    import pandas as pd
+
+    from easyfinemap.easyfinemap import EasyFinemap
+
+    try:
+        with open(loci_path, "rb") as fh:
+            loci = pd.read_csv(fh, sep="\t")
+        with open(lead_snps_path, "rb") as fh:
+            lead_snps = pd.read_csv(fh, sep="\t")
+        sumstats = _load_sumstats_for_loci(sumstats_path, loci)
+    except FileNotFoundError:
         logging.error(f"No such file of {sumstats_path} or {loci_path} or {lead_snps_path}.")
         sys.exit(1)
+    EasyFinemap.finemap_all_loci(
+        sumstats=sumstats,
+        loci=loci,
+        lead_snps=lead_snps,
+        methods=[method.value for method in methods],
+        outfile=outfile,
+        var_prior=var_prior,
+        conditional=conditional,
+        prior_file=prior_file,
+        sample_size=sample_size,
+        ldref=ldref,
+        cond_snps_wind_kb=cond_snps_wind_kb,
+        max_causal=max_causal,
+        credible_threshold=credible_threshold,
+        credible_method=credible_method,
+        use_ref_EAF=use_ref_EAF,
+        threads=threads,
+    )
 
 
 if __name__ == "__main__":
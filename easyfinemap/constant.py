@@ -1,42 +1,249 @@
-"""Define constants used in the package."""
+"""Define constants used in the package.
+
+The column names are module-level interned strings, `ColName` binds the same objects for the attribute form.
+The column groups come in pairs: the tuple (`SUMSTAT_COLS`, `LOCI_COLS`) keeps the column order, use it for
+selecting and iterating; the frozenset (`SUMSTAT_COLS_SET`, `LOCI_COLS_SET`) is for `in` tests.
+"""
+
+import sys
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Mapping, Optional, Tuple
+
+CHR = sys.intern("CHR")
+BP = sys.intern("BP")
+RSID = sys.intern("rsID")
+EA = sys.intern("EA")
+NEA = sys.intern("NEA")
+P = sys.intern("P")
+BETA = sys.intern("BETA")
+SE = sys.intern("SE")
+EAF = sys.intern("EAF")
+MAF = sys.intern("MAF")
+N = sys.intern("N")
+Z = sys.intern("Z")
+INFO = sys.intern("INFO")
+START = sys.intern("START")
+END = sys.intern("END")
+SNPID = sys.intern("SNPID")  # unique snpid, chr-bp-sorted(EA,NEA)
+COJO_P = sys.intern("COJO_P")
+COJO_BETA = sys.intern("COJO_BETA")
+COJO_SE = sys.intern("COJO_SE")
+LEAD_SNP = sys.intern("LEAD_SNP")
+# lead snp annotations, LEAD_SNP_{column}, add a column here to annotate the loci with it
+LEAD_SNP_COLS: Tuple[str, ...] = tuple(sys.intern(f"{LEAD_SNP}_{col}") for col in (P, BP))
+LEAD_SNP_P, LEAD_SNP_BP = LEAD_SNP_COLS
+# posterior probability
+PP_FINEMAP = sys.intern("PP_FINEMAP")
+PP_ABF = sys.intern("PP_ABF")
+PP_PAINTOR = sys.intern("PP_PAINTOR")
+PP_CAVIARBF = sys.intern("PP_CAVIARBF")
+PP_SUSIE = sys.intern("PP_SUSIE")
+PP_POLYFUN_FINEMAP = sys.intern("PP_POLYFUN_FINEMAP")
+PP_POLYFUN_SUSIE = sys.intern("PP_POLYFUN_SUSIE")
+
+# immutable column groups, pass `list(...)` to pandas, a tuple is treated as a single key
+SUMSTAT_COLS: Tuple[str, ...] = (CHR, BP, RSID, EA, NEA, P, BETA, SE, EAF, MAF)
+LOCI_COLS: Tuple[str, ...] = (CHR, START, END, LEAD_SNP, *LEAD_SNP_COLS)
+SUMSTAT_COLS_SET: FrozenSet[str] = frozenset(SUMSTAT_COLS)
+LOCI_COLS_SET: FrozenSet[str] = frozenset(LOCI_COLS)
 
 
 class ColName:
     """Define column names."""
 
-    CHR = "CHR"
-    BP = "BP"
-    RSID = "rsID"
-    EA = "EA"
-    NEA = "NEA"
-    P = "P"
-    BETA = "BETA"
-    SE = "SE"
-    EAF = "EAF"
-    MAF = "MAF"
-    N = "N"
-    Z = "Z"
-    INFO = "INFO"
-    START = "START"
-    END = "END"
-    SNPID = 'SNPID'  # unique snpid, chr-bp-sorted(EA,NEA)
-    COJO_P = "COJO_P"
-    COJO_BETA = "COJO_BETA"
-    COJO_SE = "COJO_SE"
-    LEAD_SNP = "LEAD_SNP"
-    LEAD_SNP_P = "LEAD_SNP_P"
-    LEAD_SNP_BP = "LEAD_SNP_BP"
-    # posterior probability
-    PP_FINEMAP = "PP_FINEMAP"
-    PP_ABF = "PP_ABF"
-    PP_PAINTOR = "PP_PAINTOR"
-    PP_CAVIARBF = "PP_CAVIARBF"
-    PP_SUSIE = "PP_SUSIE"
-    PP_POLYFUN_FINEMAP = "PP_POLYFUN_FINEMAP"
-    PP_POLYFUN_SUSIE = "PP_POLYFUN_SUSIE"
-    sumstat_cols = ['CHR', 'BP', 'rsID', 'EA', 'NEA', 'P', 'BETA', 'SE', 'EAF', 'MAF']
-    loci_cols = ['CHR', 'START', 'END', 'LEAD_SNP', 'LEAD_SNP_P', 'LEAD_SNP_BP']
+    CHR = CHR
+    BP = BP
+    RSID = RSID
+    EA = EA
+    NEA = NEA
+    P = P
+    BETA = BETA
+    SE = SE
+    EAF = EAF
+    MAF = MAF
+    N = N
+    Z = Z
+    INFO = INFO
+    START = START
+    END = END
+    SNPID = SNPID
+    COJO_P = COJO_P
+    COJO_BETA = COJO_BETA
+    COJO_SE = COJO_SE
+    LEAD_SNP = LEAD_SNP
+    LEAD_SNP_P = LEAD_SNP_P
+    LEAD_SNP_BP = LEAD_SNP_BP
+    lead_snp_cols = LEAD_SNP_COLS
+    PP_FINEMAP = PP_FINEMAP
+    PP_ABF = PP_ABF
+    PP_PAINTOR = PP_PAINTOR
+    PP_CAVIARBF = PP_CAVIARBF
+    PP_SUSIE = PP_SUSIE
+    PP_POLYFUN_FINEMAP = PP_POLYFUN_FINEMAP
+    PP_POLYFUN_SUSIE = PP_POLYFUN_SUSIE
+    sumstat_cols = SUMSTAT_COLS
+    loci_cols = LOCI_COLS
+    sumstat_cols_set = SUMSTAT_COLS_SET
+    loci_cols_set = LOCI_COLS_SET
+
+
+@dataclass(frozen=True)
+class ColSpec:
+    """
+    Define the schema of a summary statistics column.
+
+    Attributes
+    ----------
+    name : str
+        The column name.
+    description : str
+        The description of the column.
+    dtype : str
+        The dtype used when reading the column.
+    max : Optional[float]
+        The maximum allowed value, None for no upper bound or a string column.
+    min : Optional[float]
+        The minimum allowed value, None for no lower bound or a string column.
+    allow_nan : bool
+        Whether missing values are allowed.
+    nonzero : bool
+        Whether zero is not allowed.
+    """
+
+    __slots__ = ("name", "description", "dtype", "max", "min", "allow_nan", "nonzero")
+
+    name: str
+    description: str
+    dtype: str
+    max: Optional[float]
+    min: Optional[float]
+    allow_nan: bool
+    nonzero: bool
 
 
+# the 10 columns of the summary statistics, see docs/fileformats.md.
+# CHR fits in int8 and BP in int32, the effect statistics and P keep float64, so the values the tools see are
+# not rounded.
+SUMSTAT_SCHEMA: Dict[str, ColSpec] = {
+    CHR: ColSpec(CHR, "Chromosome", "int8", 23, 1, False, True),
+    BP: ColSpec(BP, "Base pair position", "int32", None, 1, False, True),
+    RSID: ColSpec(RSID, "rsID of the SNP", "object", None, None, True, False),
+    EA: ColSpec(EA, "Effective allele", "object", None, None, False, False),
+    NEA: ColSpec(NEA, "Non-effective allele", "object", None, None, False, False),
+    EAF: ColSpec(EAF, "Effective allele frequency", "float64", 1, 0, True, False),
+    MAF: ColSpec(MAF, "Minor allele frequency", "float64", 0.5, 0, True, False),
+    BETA: ColSpec(BETA, "Effect size", "float64", None, None, False, False),
+    SE: ColSpec(SE, "Standard error", "float64", None, 0, False, True),
+    P: ColSpec(P, "P-value", "float64", 1, 0, False, True),
+}
+
+# dtypes of the numeric sumstat columns, passed to the CSV readers to skip type inference.
+SUMSTAT_DTYPES: Dict[str, str] = {
+    name: spec.dtype for name, spec in SUMSTAT_SCHEMA.items() if spec.dtype != "object"
+}
+
 # only support autosomes
-CHROMS = [i for i in range(1, 24)]
+# CHROMS for membership tests, CHROMS_TUPLE for iterating in order
+CHROMS: FrozenSet[int] = frozenset(range(1, 24))
+CHROMS_TUPLE: Tuple[int, ...] = tuple(range(1, 24))
+
+
+# (min, max, allow_nan, nonzero) of the numeric sumstat columns as plain floats, open bounds as -inf/inf,
+# a homogeneous layout that can be copied into a typed dict or array for compiled validation kernels
+SCHEMA_BOUNDS: Dict[str, Tuple[float, float, float, float]] = {
+    name: (
+        float("-inf") if spec.min is None else float(spec.min),
+        float("inf") if spec.max is None else float(spec.max),
+        float(spec.allow_nan),
+        float(spec.nonzero),
+    )
+    for name, spec in SUMSTAT_SCHEMA.items()
+    if spec.dtype != "object"
+}
+
+# common header spellings of the sumstat columns in public GWAS files, matched case-insensitively.
+# usage: `canonical = COLUMN_ALIASES.get(header.lower())`
+_ALIAS_GROUPS: Dict[str, Tuple[str, ...]] = {
+    CHR: ("chr", "chrom", "chromosome", "#chrom", "#chr", "chr_name", "hg19chrom", "hg18chr", "chr_id"),
+    BP: (
+        "bp",
+        "pos",
+        "position",
+        "base_pair_location",
+        "bp_hg19",
+        "pos_b37",
+        "chr_pos",
+        "chrom_start",
+        "genpos",
+        "physpos",
+    ),
+    RSID: ("rsid", "snp", "snpid_rs", "marker", "markername", "variant_id", "rs_number", "rs", "snp_id", "id"),
+    EA: ("ea", "a1", "allele1", "effect_allele", "alt", "tested_allele", "risk_allele", "coded_allele", "inc_allele"),
+    NEA: (
+        "nea",
+        "a2",
+        "allele2",
+        "other_allele",
+        "non_effect_allele",
+        "noneffect_allele",
+        "ref",
+        "reference_allele",
+        "dec_allele",
+    ),
+    P: (
+        "p",
+        "pval",
+        "p_val",
+        "p_value",
+        "p.value",
+        "p-value",
+        "pvalue",
+        "gc.pvalue",
+        "p_bolt_lmm",
+        "frequentist_add_pvalue",
+    ),
+    BETA: ("beta", "b", "effect", "effect_size", "est", "estimate", "log_odds", "logor", "frequentist_add_beta_1"),
+    SE: ("se", "stderr", "standard_error", "std_err", "sebeta", "se_beta", "standard_error_of_beta", "logor_se"),
+    EAF: (
+        "eaf",
+        "freq",
+        "freq1",
+        "frq",
+        "af",
+        "a1freq",
+        "a1_freq",
+        "effect_allele_frequency",
+        "freq_a1",
+        "af_alt",
+        "alt_freq",
+    ),
+    MAF: ("maf", "minor_allele_frequency", "minor_af"),
+}
+COLUMN_ALIASES: Mapping[str, str] = MappingProxyType(
+    {sys.intern(alias.lower()): canonical for canonical, aliases in _ALIAS_GROUPS.items() for alias in aliases}
+)
+
+
+def _sumstat_arrow_schema():
+    """Build the pyarrow schema of `SUMSTAT_SCHEMA`, None if pyarrow is not installed."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+    arrow_types = {
+        "int8": pa.int8(),
+        "int32": pa.int32(),
+        "float64": pa.float64(),
+        "object": pa.large_string(),
+    }
+    return pa.schema([pa.field(name, arrow_types[spec.dtype]) for name, spec in SUMSTAT_SCHEMA.items()])
+
+
+def __getattr__(name):
+    """Build `SUMSTAT_ARROW_SCHEMA` on first access, importing this module does not import pyarrow."""
+    if name == "SUMSTAT_ARROW_SCHEMA":
+        schema = _sumstat_arrow_schema()
+        globals()[name] = schema
+        return schema
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -18,15 +18,18 @@ Perform fine-mapping for a locus using the following methods:
 
 import logging
 import os
+import tempfile
+from functools import lru_cache, partial
 from pathlib import Path
 from subprocess import PIPE, run
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 from multiprocessing import Pool
 from tqdm import tqdm
 
 import numpy as np
 import pandas as pd
-from concurrent.futures import ProcessPoolExecutor
+from pandas.api.types import is_object_dtype
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn, TimeElapsedColumn
 import tabix
 import smunger as sg
@@ -35,26 +38,118 @@ from easyfinemap.constant import ColName
 from easyfinemap.ldref import LDRef
 
 from easyfinemap.tools import Tools
-from easyfinemap.utils import io_in_tempdir
+from easyfinemap.utils import io_in_tempdir, read_space_sep, write_space_sep
+
+logger = logging.getLogger("EasyFinemap")
+
+
+@lru_cache(maxsize=1)
+def _susie_rss():
+    """
+    Load susieR into the embedded R session, once per process.
+
+    Returns
+    -------
+    Callable
+        `susie_rss(z, ld, prior, sample_size, max_causal)`, taking numpy arrays and returning the PIPs.
+    """
+    import rpy2.robjects as ro
+    from rpy2.rinterface_lib.callbacks import logger as rpy2_logger
+    from rpy2.robjects import numpy2ri
+    from rpy2.robjects.packages import importr
+
+    rpy2_logger.setLevel(logging.ERROR)
+    r_susie_rss = importr('susieR').susie_rss
+    converter = ro.default_converter + numpy2ri.converter
+
+    def susie_rss(z: np.ndarray, ld: np.ndarray, prior: np.ndarray, sample_size: int, max_causal: int) -> np.ndarray:
+        """Run susie_rss and return the PIPs."""
+        res = r_susie_rss(
+            z=converter.py2rpy(z),
+            R=converter.py2rpy(ld),
+            n=sample_size,
+            L=max_causal,
+            prior_weights=converter.py2rpy(prior),
+        )
+        return np.asarray(res.rx2('pip'))
+
+    return susie_rss
+
+
+def _read_ld_matrix(ld_matrix: str) -> np.ndarray:
+    """
+    Read the space-separated LD matrix made by plink.
+
+    Parameters
+    ----------
+    ld_matrix : str
+        Path to LD matrix.
+
+    Returns
+    -------
+    np.ndarray
+        The LD matrix.
+    """
+    return pd.read_csv(ld_matrix, sep=r"\s+", header=None, dtype=np.float64).to_numpy()
+
+
+def _credset_cutoff(pp: np.ndarray, threshold: float) -> int:
+    """
+    Get the size of the credible set from the PPs sorted in descending order.
+
+    A SNP is in the credible set if the sum of the PPs before it is not greater than the threshold.
+
+    Parameters
+    ----------
+    pp : np.ndarray
+        Posterior probabilities without missing values, sorted in descending order.
+    threshold : float
+        Credible threshold.
+
+    Returns
+    -------
+    int
+        The number of leading SNPs in the credible set.
+    """
+    cumsum = np.cumsum(np.asarray(pp, dtype=np.float64))
+    # the PPs are non-negative, so the cumulative sums are sorted, find the cutoff by binary search
+    return min(int(np.searchsorted(cumsum, threshold, side="right")) + 1, len(cumsum))
 
 
 class EasyFinemap(object):
     """Main class."""
 
+    TOOLS = ("finemap", "paintor", "gcta", "plink", "bcftools", "caviarbf", "model_search")
+
     def __init__(self):
         """Initialize."""
-        self.logger = logging.getLogger('EasyFinemap')
-        tool = Tools()
-        self.finemap = tool.finemap
-        self.paintor = tool.paintor
-        self.gcta = tool.gcta
-        self.plink = tool.plink
-        self.bcftools = tool.bcftools
-        self.caviarbf = tool.caviarbf
-        self.model_search = tool.model_search
+        self.logger = logger
+        tools = self._get_tools()
+        self.finemap = tools["finemap"]
+        self.paintor = tools["paintor"]
+        self.gcta = tools["gcta"]
+        self.plink = tools["plink"]
+        self.bcftools = tools["bcftools"]
+        self.caviarbf = tools["caviarbf"]
+        self.model_search = tools["model_search"]
         self.tmp_root = Path.cwd() / "tmp" / "easyfinemap"
-        if not self.tmp_root.exists():
-            self.tmp_root.mkdir(parents=True)
+        self.tmp_root.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    @lru_cache(maxsize=1)
+    def _get_tools(cls) -> Dict[str, str]:
+        """
+        Get the paths of the tools, looked up once per process.
+
+        A missing tool raises ValueError, which is not cached.
+
+        Returns
+        -------
+        Dict[str, str]
+            The tool names and their paths.
+        """
+        tool = Tools()
+        return {name: getattr(tool, name) for name in cls.TOOLS}
 
     def run_abf(
         self, sumstats: pd.DataFrame, var_prior: float = 0.2, max_causal: int = 1, **kwargs
@@ -64,12 +159,14 @@ class EasyFinemap(object):
 
         calculate the approximate Bayes factor (ABF) from BETA and SE, using the
         formula:
-        SNP_BF = sqrt(SE/(SE + W^2))EXP(W^2/(SE + W^2)*(BETA^2/SE^2)/2)
+        SNP_BF = sqrt(SE^2/(SE^2 + W^2))EXP(W^2/(SE^2 + W^2)*(BETA^2/SE^2)/2)
         where W is variance prior, usually set to 0.15 for quantitative traits
         and 0.2 for binary traits.
         the posterior probability of each variant being causal is calculated
         using the formula:
         PP(causal) = SNP_BF / sum(all_SNP_BFs)
+        the BFs are computed in log space and scaled by the largest one before
+        exponentiating, so large Z-scores do not overflow.
 
         Reference: Asimit, J. L. et al. Eur J Hum Genet (2016)
 
@@ -90,16 +187,32 @@ class EasyFinemap(object):
         """
         if max_causal > 1:
             raise NotImplementedError("ABF only support single causal variant.")
-        df = sumstats.copy()
-        df["W2"] = var_prior**2
-        df["SNP_BF"] = np.sqrt((df[ColName.SE] ** 2 / (df[ColName.SE] ** 2 + df["W2"]))) * np.exp(
-            df["W2"]
-            / (df[ColName.BETA] ** 2 + df["W2"])
-            * (df[ColName.BETA] ** 2 / df[ColName.SE] ** 2)
-            / 2
-        )
-        df[ColName.PP_ABF] = df["SNP_BF"] / df["SNP_BF"].sum()
-        return pd.Series(data=df[ColName.PP_ABF].values, index=df[ColName.SNPID].tolist())
+        beta = sumstats[ColName.BETA].to_numpy(dtype=np.float64)
+        se = sumstats[ColName.SE].to_numpy(dtype=np.float64)
+        w2 = var_prior**2
+        # log(BF) = 0.5 * log(1 - r) + 0.5 * r * Z^2, r = W^2 / (SE^2 + W^2),
+        # computed in place in three buffers, beta and se may be views of sumstats and are only read
+        v = np.multiply(se, se)
+        r = np.add(v, w2)
+        np.divide(w2, r, out=r)
+        z2 = np.multiply(beta, beta)
+        np.divide(z2, v, out=z2)
+        log_bf = np.log1p(np.negative(r, out=v), out=v)
+        np.multiply(r, z2, out=z2)
+        np.add(log_bf, z2, out=log_bf)
+        log_bf *= 0.5
+        # a SNP with missing BETA or SE gets a NaN PP, without turning the other PPs into NaN
+        log_bf -= np.nanmax(log_bf)
+        bf = np.exp(log_bf, out=log_bf)
+        bf /= np.nansum(bf)
+        return pd.Series(data=bf, index=sumstats[ColName.SNPID].to_numpy())
+
+    @staticmethod
+    def _get_zscore(sumstats: pd.DataFrame) -> pd.Series:
+        """Get the Z-scores, precomputed in `finemap_locus`, or BETA/SE if the column is missing."""
+        if ColName.Z in sumstats.columns:
+            return sumstats[ColName.Z]
+        return sumstats[ColName.BETA] / sumstats[ColName.SE]
 
     @io_in_tempdir('./tmp/easyfinemap')
     def run_finemap(
@@ -118,7 +231,7 @@ class EasyFinemap(object):
         Parameters
         ----------
         sumstats : pd.DataFrame
-            Summary statistics.
+            Summary statistics, read only, the methods of a locus share the same input.
         ld_matrix : str
             Path to LD matrix.
         sample_size : int
@@ -137,76 +250,32 @@ class EasyFinemap(object):
         """
         if ColName.MAF not in sumstats.columns:
             raise ValueError(f"{ColName.MAF} is required for FINEMAP.")
-        finemap_input = sumstats.copy()
-        finemap_input[ColName.MAF] = finemap_input[ColName.MAF].replace(0, 0.00001)
+        columns = {
+            ColName.SNPID: "rsid",
+            ColName.CHR: "chromosome",
+            ColName.BP: "position",
+            ColName.EA: "allele1",
+            ColName.NEA: "allele2",
+            ColName.MAF: "maf",
+            ColName.BETA: "beta",
+            ColName.SE: "se",
+        }
+        # the output columns refer to the sumstats columns, only the derived ones are new arrays
+        finemap_input = {new: sumstats[old] for old, new in columns.items()}
+        # FINEMAP rejects maf == 0, floor it at 1e-5 in a single pass
+        finemap_input["maf"] = np.maximum(sumstats[ColName.MAF].to_numpy(), 0.00001)
         if prior_file:
-            finemap_input = finemap_input[
-                [
-                    ColName.SNPID,
-                    ColName.CHR,
-                    ColName.BP,
-                    ColName.EA,
-                    ColName.NEA,
-                    ColName.MAF,
-                    ColName.BETA,
-                    ColName.SE,
-                    'SNPVAR',
-                ]
-            ]
-            finemap_input.rename(
-                columns={
-                    ColName.SNPID: "rsid",
-                    ColName.CHR: "chromosome",
-                    ColName.BP: "position",
-                    ColName.MAF: "maf",
-                    ColName.BETA: "beta",
-                    ColName.SE: "se",
-                    ColName.EA: "allele1",
-                    ColName.NEA: "allele2",
-                    'SNPVAR': 'prob',
-                },
-                inplace=True,
-            )
-            finemap_input['prob'] = finemap_input['prob'] / finemap_input['prob'].sum()
-        else:
-            finemap_input = finemap_input[
-                [
-                    ColName.SNPID,
-                    ColName.CHR,
-                    ColName.BP,
-                    ColName.EA,
-                    ColName.NEA,
-                    ColName.MAF,
-                    ColName.BETA,
-                    ColName.SE,
-                ]
-            ]
-            finemap_input.rename(
-                columns={
-                    ColName.SNPID: "rsid",
-                    ColName.CHR: "chromosome",
-                    ColName.BP: "position",
-                    ColName.MAF: "maf",
-                    ColName.BETA: "beta",
-                    ColName.SE: "se",
-                    ColName.EA: "allele1",
-                    ColName.NEA: "allele2",
-                },
-                inplace=True,
-            )
-        finemap_input.to_csv(f"{temp_dir}/finemap.z", sep=" ", index=False, float_format="%0.5f")
-        with open(f"{temp_dir}/finemap.master", "w") as f:
-            master_content = [
-                f"{temp_dir}/finemap.z",
-                ld_matrix,
-                f"{temp_dir}/finemap.snp",
-                f"{temp_dir}/finemap.config",
-                f"{temp_dir}/finemap.cred",
-                f"{temp_dir}/finemap.log",
-                str(sample_size),
-            ]
-            f.write("z;ld;snp;config;cred;log;n_samples\n")
-            f.write(";".join(master_content))
+            finemap_input["prob"] = sumstats['SNPVAR'] / sumstats['SNPVAR'].sum()
+        # 6 significant digits, also for the small SEs and prior probabilities a fixed %f would round to 0
+        fmts = ["%s", "%d", "%d", "%s", "%s", "%.6g", "%.6g", "%.6g"]
+        if prior_file:
+            fmts.append("%.6g")
+        write_space_sep(f"{temp_dir}/finemap.z", finemap_input, fmts)
+        Path(f"{temp_dir}/finemap.master").write_text(
+            "z;ld;snp;config;cred;log;n_samples\n"
+            f"{temp_dir}/finemap.z;{ld_matrix};{temp_dir}/finemap.snp;{temp_dir}/finemap.config;"
+            f"{temp_dir}/finemap.cred;{temp_dir}/finemap.log;{sample_size}"
+        )
         cmd = [
             self.finemap,
             "--sss",
@@ -216,14 +285,19 @@ class EasyFinemap(object):
             str(max_causal),
             "--prior-snps" if prior_file else "",
         ]
-        res = run(cmd, stdout=PIPE, stderr=PIPE, universal_newlines=True)
+        # the FINEMAP log goes to a file in the tempdir instead of Python memory, read back only on failure
+        with open(f"{temp_dir}/finemap.stdout", "wb") as stdout:
+            res = run(cmd, stdout=stdout, stderr=PIPE)
         self.logger.debug(f"run FINEMAP: {' '.join(cmd)}")
         if res.returncode != 0:
-            self.logger.error(res.stderr)
-            raise RuntimeError(res.stderr)
+            err = res.stderr.decode(errors="replace") or Path(f"{temp_dir}/finemap.stdout").read_text(errors="replace")
+            self.logger.error(err)
+            raise RuntimeError(err)
         else:
             # if max_causal == 1:
-            finemap_res = pd.read_csv(f"{temp_dir}/finemap.snp", sep=" ", usecols=["rsid", "prob"])
+            finemap_res = read_space_sep(
+                f"{temp_dir}/finemap.snp", usecols=["rsid", "prob"], dtype={"rsid": object, "prob": np.float64}
+            )
             finemap_res = pd.Series(finemap_res["prob"].values, index=finemap_res["rsid"].values)  # type: ignore
             # else:
             #     raise NotImplementedError
@@ -244,7 +318,7 @@ class EasyFinemap(object):
         Parameters
         ----------
         sumstats : pd.DataFrame
-            Summary statistics.
+            Summary statistics, read only, the methods of a locus share the same input.
         ld_matrix : str
             Path to LD matrix.
         max_causal : int, optional
@@ -257,25 +331,25 @@ class EasyFinemap(object):
         pd.Series
             The result of PAINTOR.
         """
-        paintor_input = sumstats.copy()
-        paintor_input["coding"] = 1  # TODO: support paintor annotation mode
-        paintor_input["Zscore"] = paintor_input[ColName.BETA] / paintor_input[ColName.SE]
+        paintor_input = {
+            ColName.SNPID: sumstats[ColName.SNPID],
+            ColName.CHR: sumstats[ColName.CHR],
+            ColName.BP: sumstats[ColName.BP],
+            "Zscore": self._get_zscore(sumstats),
+        }
         input_prefix = "paintor.processed"
-        paintor_input[[ColName.SNPID, ColName.CHR, ColName.BP, "Zscore"]].to_csv(
-            f"{temp_dir}/{input_prefix}", sep=" ", index=False
-        )
-        paintor_input["coding"].to_csv(
-            f"{temp_dir}/{input_prefix}.annotations", sep=" ", index=False, header=True
+        write_space_sep(f"{temp_dir}/{input_prefix}", paintor_input, ["%s", "%d", "%d", "%.6g"])
+        # TODO: support paintor annotation mode
+        write_space_sep(
+            f"{temp_dir}/{input_prefix}.annotations", {"coding": np.ones(len(sumstats), dtype=np.int64)}, ["%d"]
         )
         with open(f"{temp_dir}/{input_prefix}.input", "w") as f:
             f.write(input_prefix)
         ld_matrix_abs_path = os.path.abspath(ld_matrix)
-        run(
-            ['ln', "-s", ld_matrix_abs_path, f'{temp_dir}/{input_prefix}.ld'],
-            stdout=PIPE,
-            stderr=PIPE,
-            universal_newlines=True,
-        )
+        try:
+            os.symlink(ld_matrix_abs_path, f'{temp_dir}/{input_prefix}.ld')
+        except FileExistsError:
+            pass
         cmd = [
             self.paintor,
             "-input",
@@ -297,10 +371,10 @@ class EasyFinemap(object):
             self.logger.error(res.stderr)
             raise RuntimeError(res.stderr)
         else:
-            paintor_res = pd.read_csv(
+            paintor_res = read_space_sep(
                 f"{temp_dir}/paintor.processed.results",
-                sep=" ",
                 usecols=["SNPID", "Posterior_Prob"],
+                dtype={"SNPID": object, "Posterior_Prob": np.float64},
             )
             paintor_res = pd.Series(
                 paintor_res["Posterior_Prob"].values, index=paintor_res["SNPID"].tolist()
@@ -322,7 +396,7 @@ class EasyFinemap(object):
         Parameters
         ----------
         sumstats : pd.DataFrame
-            Summary statistics.
+            Summary statistics, read only, the methods of a locus share the same input.
         ld_matrix : str
             Path to LD matrix.
         max_causal : int, optional
@@ -335,12 +409,12 @@ class EasyFinemap(object):
         pd.Series
             The result of CAVIAR-BF.
         """
-        caviar_input = sumstats.copy()
-        caviar_input[ColName.Z] = caviar_input[ColName.BETA] / caviar_input[ColName.SE]
-        caviar_input[[ColName.SNPID, ColName.Z]].to_csv(
-            f"{temp_dir}/caviar.input", sep=" ", index=False, header=False
-        )
-        n_variants = caviar_input.shape[0]
+        caviar_input = {
+            ColName.SNPID: sumstats[ColName.SNPID],
+            ColName.Z: self._get_zscore(sumstats),
+        }
+        write_space_sep(f"{temp_dir}/caviar.input", caviar_input, ["%s", "%.6g"], header=False)
+        n_variants = len(sumstats)
         cmd = [
             self.caviarbf,
             "-z",
@@ -377,12 +451,13 @@ class EasyFinemap(object):
             self.logger.error(res.stderr)
             raise RuntimeError(res.stderr)
         else:
-            caviar_res = pd.read_csv(f"{temp_dir}/caviar.prior0.marginal", sep=" ", header=None)
+            caviar_res = read_space_sep(
+                f"{temp_dir}/caviar.prior0.marginal", header=None, dtype={0: np.int64, 1: np.float64}
+            )
             caviar_res.sort_values(by=0, inplace=True)  # type: ignore
-            caviar_res = pd.Series(caviar_res[1].values, index=caviar_input[ColName.SNPID].tolist())
+            caviar_res = pd.Series(caviar_res[1].values, index=sumstats[ColName.SNPID].tolist())
             return caviar_res
 
-    @io_in_tempdir('./tmp/easyfinemap')
     def run_susie(
         self,
         sumstats: pd.DataFrame,
@@ -391,6 +466,7 @@ class EasyFinemap(object):
         max_causal: int = 1,
         prior_file: Optional[str] = None,
         temp_dir: Optional[str] = None,
+        ld: Optional[np.ndarray] = None,
         **kwargs,
     ) -> pd.Series:
         """
@@ -399,7 +475,7 @@ class EasyFinemap(object):
         Parameters
         ----------
         sumstats : pd.DataFrame
-            Summary statistics.
+            Summary statistics, read only, the methods of a locus share the same input.
         ld_matrix : str
             Path to LD matrix.
         sample_size : int
@@ -408,43 +484,46 @@ class EasyFinemap(object):
             Maximum number of causal variants, by default 1
         prior_file : Optional[str], optional
             Path to prior file, by default None
+        ld : Optional[np.ndarray], optional
+            The LD matrix already read from `ld_matrix`, by default None, then it is read here
 
         Returns
         -------
         pd.Series
             The result of SuSiE.
         """
-        susie_input = sumstats.copy()
-        susie_input[ColName.Z] = susie_input[ColName.BETA] / susie_input[ColName.SE]
         if prior_file:
-            susie_input['SNPVAR'] = susie_input['SNPVAR'] / susie_input['SNPVAR'].sum()
+            prior = sumstats['SNPVAR'] / sumstats['SNPVAR'].sum()
         else:
-            susie_input['SNPVAR'] = 1 / len(susie_input)
-        susie_input[[ColName.SNPID, ColName.Z, 'SNPVAR']].to_csv(
-            f"{temp_dir}/susie.input", sep=" ", index=False, header=True
-        )
-        self.logger.debug(f"run SuSiE: {temp_dir}/susie.input, prior_file: {prior_file}")
-
-        import rpy2.robjects as ro
-        from rpy2.rinterface_lib.callbacks import logger as rpy2_logger
-
-        rpy2_logger.setLevel(logging.ERROR)
-
-        ro.r(
-            f'''library('data.table')
-                ld = fread('{ld_matrix}', sep=' ', header=FALSE)
-                ld = as.matrix(ld)
-                df = fread('{temp_dir}/susie.input', sep=' ', header=TRUE)
-                z = df$Z
-                prior = df$SNPVAR
-                library('susieR')
-                res = susie_rss(z, ld, n={sample_size}, L = {max_causal}, prior_weights = prior)
-                pip = res$pip'''
-        )
-        susie_input['pip'] = ro.r('pip')
-        susie_res = pd.Series(susie_input['pip'].values, index=susie_input[ColName.SNPID].tolist())
+            prior = np.full(len(sumstats), 1 / len(sumstats))
+        z = self._get_zscore(sumstats).to_numpy(dtype=np.float64)
+        prior = np.asarray(prior, dtype=np.float64)
+        if ld is None:
+            ld = _read_ld_matrix(ld_matrix)
+        self.logger.debug(f"run SuSiE: {ld_matrix}, prior_file: {prior_file}")
+        pip = _susie_rss()(z, ld, prior, sample_size, max_causal)
+        susie_res = pd.Series(pip, index=sumstats[ColName.SNPID].tolist())
         return susie_res
 
+    @staticmethod
+    def _index_lead_snps(lead_snps: pd.DataFrame) -> pd.DataFrame:
+        """
+        Index the lead SNPs by SNPID and sort them by CHR and BP, for the lookups in `cond_sumstat`.
+
+        Parameters
+        ----------
+        lead_snps : pd.DataFrame
+            Lead SNPs.
+
+        Returns
+        -------
+        pd.DataFrame
+            Lead SNPs indexed by SNPID, the SNPID column is kept.
+        """
+        lead_snps = lead_snps.sort_values([ColName.CHR, ColName.BP], kind="stable")
+        lead_snps.index = pd.Index(lead_snps[ColName.SNPID].to_numpy(), dtype=object)
+        return lead_snps
+
     @io_in_tempdir('./tmp/easyfinemap')
     def cond_sumstat(
         self,
@@ -467,6 +546,8 @@ class EasyFinemap(object):
             Summary statistics.
         lead_snp : str
             Lead SNP.
+        lead_snps : pd.DataFrame
+            Lead SNPs, preferably indexed by `_index_lead_snps`, otherwise they are indexed here.
         ldref : str
             Path to LD reference.
         sample_size : int
@@ -487,14 +568,20 @@ class EasyFinemap(object):
             raise ValueError("Lead SNP is required for conditional finemapping")
         if lead_snps is None:
             raise ValueError("Lead SNPs are required for conditional finemapping")
-        lead_snp_chr = lead_snps.loc[lead_snps[ColName.SNPID] == lead_snp, ColName.CHR].values[0]
-        lead_snp_bp: int = lead_snps.loc[lead_snps[ColName.SNPID] == lead_snp, ColName.BP].values[0]  # type: ignore
-        cond_snps = lead_snps[
-            (lead_snps[ColName.CHR] == lead_snp_chr)
-            & (lead_snps[ColName.BP] >= lead_snp_bp - cond_snps_wind_kb * 1000)
-            & (lead_snps[ColName.BP] <= lead_snp_bp + cond_snps_wind_kb * 1000)
-            & (lead_snps[ColName.SNPID] != lead_snp)
-        ].copy()
+        if not is_object_dtype(lead_snps.index):
+            lead_snps = self._index_lead_snps(lead_snps)
+        lead_snp_chr = lead_snps.at[lead_snp, ColName.CHR]
+        lead_snp_bp: int = lead_snps.at[lead_snp, ColName.BP]  # type: ignore
+        # lead_snps is sorted by CHR and BP, the window is a contiguous slice found by binary search
+        chroms = lead_snps[ColName.CHR].to_numpy()
+        chr_start = np.searchsorted(chroms, lead_snp_chr, side="left")
+        chr_end = np.searchsorted(chroms, lead_snp_chr, side="right")
+        chr_bp = lead_snps[ColName.BP].to_numpy()[chr_start:chr_end]
+        wind = cond_snps_wind_kb * 1000
+        wind_start = chr_start + np.searchsorted(chr_bp, lead_snp_bp - wind, side="left")
+        wind_end = chr_start + np.searchsorted(chr_bp, lead_snp_bp + wind, side="right")
+        cond_snps = lead_snps.iloc[wind_start:wind_end]
+        cond_snps = cond_snps[cond_snps.index != lead_snp].reset_index(drop=True)
         if cond_snps.empty:
             self.logger.debug(f"No conditional SNPs found for {lead_snp}")
             cond_res = sumstats.copy()
@@ -508,16 +595,15 @@ class EasyFinemap(object):
                     cond_snps.drop(columns=[col], inplace=True)
             chrom = lead_snp_chr
             all_sumstats = pd.concat([sumstats, cond_snps], ignore_index=True)
-            all_sumstats.drop_duplicates(subset=[ColName.SNPID], inplace=True)
-            all_sumstats.sort_values(by=[ColName.CHR, ColName.BP], inplace=True)
-            all_sumstats.reset_index(drop=True, inplace=True)
+            all_sumstats = all_sumstats[~all_sumstats[ColName.SNPID].duplicated().to_numpy()]
+            all_sumstats = all_sumstats.sort_values(by=[ColName.CHR, ColName.BP], kind="stable", ignore_index=True)
             cojo_input = ld.intersect(
-                all_sumstats, ldref, f"{temp_dir}/cojo_input_{chrom}", use_ref_EAF
+                all_sumstats, ldref, f"{temp_dir}/cojo_input_{chrom}", use_ref_EAF, temp_dir=temp_dir
             )
             self.logger.debug(f"Lead SNP: {lead_snp}")
             self.logger.debug(f"Conditional SNPs: {cond_snps['SNPID'].tolist()}")
             cond_res = ld.cojo_cond(
-                cojo_input, cond_snps, f"{temp_dir}/cojo_input_{chrom}", sample_size, use_ref_EAF
+                cojo_input, cond_snps, f"{temp_dir}/cojo_input_{chrom}", sample_size, use_ref_EAF, temp_dir=temp_dir
             )  # type: ignore
         return cond_res
 
@@ -527,6 +613,7 @@ class EasyFinemap(object):
         ldref: str,
         outprefix: str,
         use_ref_EAF: bool = False,
+        temp_dir: Optional[str] = None,
         **kwargs,
     ) -> pd.DataFrame:
         """
@@ -542,17 +629,21 @@ class EasyFinemap(object):
             Output prefix.
         use_ref_EAF : bool, optional
             Use reference EAF, by default False
+        temp_dir : Optional[str], optional
+            Path to tempdir, by default None, a new one is made for the intersection
 
         Returns
         -------
         pd.DataFrame
-            LD matrix.
+            The summary statistics of the SNPs in the LD matrix `{outprefix}.ld`,
+            empty if no SNP is in the LD reference or the LD matrix could not be made.
         """
         if ldref is None:
             raise ValueError("LD reference is required for LD-based finemapping")
         ld = LDRef()
-        sumstats_ol = ld.intersect(sumstats, ldref, outprefix, use_ref_EAF)
-        ld.make_ld(outprefix, outprefix)
+        sumstats_ol = ld.intersect(sumstats, ldref, outprefix, use_ref_EAF, temp_dir=temp_dir)
+        if sumstats_ol.empty or not ld.make_ld(outprefix, outprefix):
+            return sumstats_ol.iloc[:0]
         return sumstats_ol
 
     def get_credset(
@@ -588,16 +679,18 @@ class EasyFinemap(object):
             credible_threshold = credible_threshold * max_causal
             if credible_method:
                 pp_col = f"PP_{credible_method.upper()}"
-                credible_set = finemap_res.sort_values(pp_col, ascending=False)
-                credible_set = finemap_res.sort_values(by=pp_col, ascending=False)
-                credible_set = credible_set[
-                    credible_set[pp_col].shift().fillna(0).cumsum() <= credible_threshold
-                ]
+                # sort the PPs only and take the rows of the credible set, the stable sort keeps ties in input order
+                pp = finemap_res[pp_col].to_numpy(dtype=np.float64)
+                order = np.argsort(-pp, kind="stable")
+                # SNPs without a PP are never in the credible set, even if the threshold is not reached
+                order = order[~np.isnan(pp[order])]
+                order = order[: _credset_cutoff(pp[order], credible_threshold)]
+                credible_set = finemap_res.iloc[order].reset_index(drop=True)
             else:
                 raise ValueError(
                     "Must specify credible set method when credible threshold is specified"
                 )
-        return credible_set.reset_index(drop=True)
+        return credible_set
 
     def annotate_prior(
         self,
@@ -628,24 +721,154 @@ class EasyFinemap(object):
         header = pd.read_csv(prior_file, sep="\t", nrows=0).columns.tolist()
         if 'snpvar_bin' not in header:
             raise ValueError(f"No snpvar_bin in {prior_file}")
+        for col in [ColName.BP, 'A1', 'A2']:
+            if col not in header:
+                raise ValueError(f"No {col} in {prior_file}")
+        bp_idx, a1_idx, a2_idx, snpvar_idx = (header.index(col) for col in [ColName.BP, 'A1', 'A2', 'snpvar_bin'])
         # annotate
         tb = tabix.open(prior_file)
         chrom = sumstats[ColName.CHR].unique()[0]
         start = sumstats[ColName.BP].min()
         end = sumstats[ColName.BP].max()
-        prior_df = pd.DataFrame(data=tb.query(str(chrom), start, end), columns=header)
-        prior_df = prior_df.rename(columns={"snpvar_bin": "SNPVAR"})
-        prior_df['SNPVAR'] = prior_df['SNPVAR'].astype(float)
+        # only keep the needed columns of the tabix rows, parsed into typed buffers grown by doubling
+        capacity = max(1024, len(sumstats))
+        bp = np.empty(capacity, dtype=np.int64)
+        a1 = np.empty(capacity, dtype=object)
+        a2 = np.empty(capacity, dtype=object)
+        snpvar = np.empty(capacity, dtype=np.float64)
+        n_rows = 0
+        for row in tb.query(str(chrom), start, end):
+            if n_rows == capacity:
+                capacity *= 2
+                bp, a1, a2, snpvar = (np.resize(buf, capacity) for buf in (bp, a1, a2, snpvar))
+            bp[n_rows] = int(row[bp_idx])
+            a1[n_rows] = row[a1_idx]
+            a2[n_rows] = row[a2_idx]
+            snpvar[n_rows] = float(row[snpvar_idx])
+            n_rows += 1
+        prior_df = pd.DataFrame(
+            {
+                ColName.CHR: np.full(n_rows, chrom),
+                ColName.BP: bp[:n_rows],
+                'A1': a1[:n_rows],
+                'A2': a2[:n_rows],
+                'SNPVAR': snpvar[:n_rows],
+            }
+        )
         prior_df = sg.make_SNPID_unique(prior_df, ColName.CHR, ColName.BP, 'A1', 'A2')
         prior_df = prior_df.drop_duplicates(subset=ColName.SNPID)
-        prior_map = prior_df[['SNPID', 'SNPVAR']].set_index('SNPID').to_dict()['SNPVAR']
-        sumstats['SNPVAR'] = sumstats[ColName.SNPID].map(prior_map).fillna(0)
+        prior = prior_df.set_index(ColName.SNPID)['SNPVAR']
+        sumstats['SNPVAR'] = prior.reindex(sumstats[ColName.SNPID].to_numpy()).fillna(0).to_numpy()
         return sumstats
 
+    def _run_methods(
+        self,
+        out_sumstats: pd.DataFrame,
+        fm_input: pd.DataFrame,
+        ld_ol: Optional[pd.DataFrame],
+        methods: List[str],
+        ld_methods: List[str],
+        prior_file: Optional[str] = None,
+        temp_dir: Optional[str] = None,
+        tool_threads: int = 1,
+        **kwargs,
+    ) -> pd.DataFrame:
+        """
+        Run the finemapping methods of a locus and add their posterior probabilities to the output sumstats.
+
+        Parameters
+        ----------
+        out_sumstats : pd.DataFrame
+            Output summary statistics, the posterior probabilities are added to it.
+        fm_input : pd.DataFrame
+            Input summary statistics of ABF.
+        ld_ol : Optional[pd.DataFrame]
+            Summary statistics intersected with the LD reference, None if no method needs LD.
+        methods : List[str]
+            Finemapping methods.
+        ld_methods : List[str]
+            The methods that need LD.
+        prior_file : Optional[str], optional
+            Path to prior file, by default None
+        temp_dir : Optional[str], optional
+            Temporary directory, by default None
+        tool_threads : int, optional
+            Number of external tools run at the same time, by default 1
+
+        Returns
+        -------
+        pd.DataFrame
+            Output summary statistics with a posterior probability column for each method.
+        """
+        pp_cols = {
+            "abf": ColName.PP_ABF,
+            "finemap": ColName.PP_FINEMAP,
+            "paintor": ColName.PP_PAINTOR,
+            "caviarbf": ColName.PP_CAVIARBF,
+            "susie": ColName.PP_SUSIE,
+            "polyfun_finemap": ColName.PP_POLYFUN_FINEMAP,
+            "polyfun_susie": ColName.PP_POLYFUN_SUSIE,
+        }
+        pp_results = {}
+        ld_matrix = f"{temp_dir}/intersc.ld"
+        r_methods: List[str] = []
+        futures = {}
+        executor = None
+        if ld_methods and ld_ol.empty:
+            for method in ld_methods:
+                self.logger.warning(f"LD matrix {ld_matrix} is not made, skip {method}")
+                pp_results[method] = None
+        elif ld_methods:
+            runners = {
+                "finemap": partial(self.run_finemap, prior_file=None),
+                "paintor": self.run_paintor,
+                "caviarbf": self.run_caviarbf,
+                "susie": partial(self.run_susie, prior_file=None),
+                "polyfun_finemap": partial(self.run_finemap, prior_file=prior_file),
+                "polyfun_susie": partial(self.run_susie, prior_file=prior_file),
+            }
+            # the external tools run in up to `tool_threads` threads, each in its own tempdir under the locus tempdir,
+            # the sequential steps of finemap_locus share the locus tempdir,
+            # SuSiE runs in the embedded R session, which is not thread-safe, so it stays on this thread
+            tool_methods = [method for method in ld_methods if method not in ("susie", "polyfun_susie")]
+            r_methods = [method for method in ld_methods if method in ("susie", "polyfun_susie")]
+            if tool_methods:
+                executor = ThreadPoolExecutor(max_workers=max(1, min(tool_threads, len(tool_methods))))
+                futures = {
+                    method: executor.submit(
+                        runners[method],
+                        sumstats=ld_ol,
+                        ld_matrix=ld_matrix,
+                        temp_dir=tempfile.mkdtemp(dir=temp_dir),
+                        **kwargs,
+                    )
+                    for method in tool_methods
+                }
+        try:
+            # ABF and SuSiE are computed on this thread while the external tools are running
+            if "abf" in methods:
+                pp_results["abf"] = self.run_abf(sumstats=fm_input, **kwargs)
+            if r_methods:
+                # read the LD matrix once for susie and polyfun_susie
+                ld = _read_ld_matrix(ld_matrix)
+                for method in r_methods:
+                    pp_results[method] = runners[method](sumstats=ld_ol, ld_matrix=ld_matrix, ld=ld, **kwargs)
+            for method, future in futures.items():
+                pp_results[method] = future.result()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        # add the posterior probabilities in the order of the requested methods
+        snpids = out_sumstats[ColName.SNPID].to_numpy()
+        for method in methods:
+            pp = pp_results[method]
+            out_sumstats[pp_cols[method]] = np.nan if pp is None else pp.reindex(snpids).to_numpy()
+        return out_sumstats
+
     @io_in_tempdir('./tmp/easyfinemap')
     def finemap_locus(
         self,
-        sumstats: pd.DataFrame,
+        sumstats: Union[str, pd.DataFrame],
         chrom: str,
         start: int,
         end: int,
@@ -654,6 +877,7 @@ class EasyFinemap(object):
         conditional: bool = False,
         prior_file: Optional[str] = None,
         temp_dir: Optional[str] = None,
+        tool_threads: int = 1,
         **kwargs,
     ) -> pd.DataFrame:
         """
@@ -668,8 +892,8 @@ class EasyFinemap(object):
 
         Parameters
         ----------
-        sumstats : pd.DataFrame
-            Summary statistics.
+        sumstats : Union[str, pd.DataFrame]
+            Path to the tabix-indexed summary statistics, or the summary statistics already loaded.
         methods : List[str]
             Finemapping methods.
         lead_snp : str
@@ -678,38 +902,50 @@ class EasyFinemap(object):
             Conditional finemapping, by default False
         temp_dir : Optional[str], optional
             Temporary directory, by default None
+        tool_threads : int, optional
+            Number of external tools, FINEMAP, PAINTOR and CAVIAR-BF, run at the same time, by default 1
 
         Returns
         -------
         pd.DataFrame
             Finemapping results.
         """
-        locus_sumstats = sg.export_sumstats(sumstats, chrom, start, end)
+        if isinstance(sumstats, pd.DataFrame):
+            in_locus = (sumstats[ColName.CHR] == chrom) & sumstats[ColName.BP].between(start, end)
+            locus_sumstats = sg.munge(sumstats[in_locus])
+        else:
+            locus_sumstats = sg.export_sumstats(sumstats, chrom, start, end)
         locus_sumstats = sg.make_SNPID_unique(
             locus_sumstats, ColName.CHR, ColName.BP, ColName.EA, ColName.NEA
         )
-        locus_sumstats = locus_sumstats.replace(np.inf, 100)
-        locus_sumstats = locus_sumstats.replace(-np.inf, -100)
+        # replace +-inf with +-100, only the float columns can hold inf
+        for col in locus_sumstats.select_dtypes(include=[np.floating]).columns:
+            values = locus_sumstats[col].to_numpy()
+            is_inf = np.isinf(values)
+            if is_inf.any():
+                locus_sumstats[col] = np.where(is_inf, np.copysign(100, values), values)
         self.logger.info(f"Finemap {chrom}:{start}-{end}")
         self.logger.info(f"Number of SNPs: {locus_sumstats.shape[0]}")
         if len(locus_sumstats) > 5000:
             self.logger.warning(
                 "The number of SNPs is greater than 5000, reduce the number of SNPs to 5000"
             )
-            locus_sumstats = locus_sumstats[
-                locus_sumstats[ColName.P] < locus_sumstats[ColName.P].nsmallest(5000).iloc[-1]
-            ].copy()
+            # keep the CHR/BP order, the LD matrix made by plink follows it
+            locus_sumstats = locus_sumstats.nsmallest(5000, ColName.P).sort_values(
+                [ColName.CHR, ColName.BP], kind="stable", ignore_index=True
+            )
         if conditional:
-            cond_res = self.cond_sumstat(sumstats=locus_sumstats, lead_snp=lead_snp, **kwargs)
-            fm_input = cond_res.copy()
-            fm_input[ColName.BETA] = cond_res[ColName.COJO_BETA]
-            fm_input[ColName.SE] = cond_res[ColName.COJO_SE]
-            fm_input[ColName.P] = cond_res[ColName.COJO_P]
+            cond_res = self.cond_sumstat(sumstats=locus_sumstats, lead_snp=lead_snp, temp_dir=temp_dir, **kwargs)
             out_sumstats = locus_sumstats.merge(
                 cond_res[[ColName.SNPID, ColName.COJO_BETA, ColName.COJO_SE, ColName.COJO_P]],
                 on=ColName.SNPID,
                 how="left",
+                sort=False,
             )
+            fm_input = cond_res.copy()
+            fm_input[ColName.BETA] = cond_res[ColName.COJO_BETA]
+            fm_input[ColName.SE] = cond_res[ColName.COJO_SE]
+            fm_input[ColName.P] = cond_res[ColName.COJO_P]
             max_causal = kwargs.get("max_causal", 1)
             if max_causal > 1:
                 self.logger.warning(
@@ -742,83 +978,31 @@ class EasyFinemap(object):
         if prior_file:
             fm_input_ol = self.annotate_prior(fm_input_ol, prior_file)
             out_sumstats = self.annotate_prior(out_sumstats, prior_file)
+        ld_ol = None
         if len(set(methods).intersection(set(methods_required_ld))) > 0:
             # TODO: reduce the number of SNPs when using paintor and caviarbf in multiple causal variant mode
             ld_ol = self.prepare_ld_matrix(
-                sumstats=fm_input_ol, outprefix=f"{temp_dir}/intersc", **kwargs
+                sumstats=fm_input_ol, outprefix=f"{temp_dir}/intersc", temp_dir=temp_dir, **kwargs
             )
+            # shared by PAINTOR, CAVIAR-BF and SuSiE, empty if the LD matrix is not made
+            if not ld_ol.empty:
+                ld_ol[ColName.Z] = ld_ol[ColName.BETA].to_numpy() / ld_ol[ColName.SE].to_numpy()
         # if os.path.exists(f"{temp_dir}/intersc.ld"):
         #     fm_input_ol = ld_ol.copy()
         for method in methods:
-            if method == "abf":
-                abf_pp = self.run_abf(sumstats=fm_input_ol, **kwargs)
-                out_sumstats[ColName.PP_ABF] = out_sumstats[ColName.SNPID].map(abf_pp)
-            elif method in methods_required_ld:
-                ld_matrix = f"{temp_dir}/intersc.ld"
-                if method == "finemap":
-                    if os.path.exists(ld_matrix):
-                        finemap_pp = self.run_finemap(
-                            sumstats=ld_ol, ld_matrix=ld_matrix, prior_file=None, **kwargs
-                        )
-                        out_sumstats[ColName.PP_FINEMAP] = out_sumstats[ColName.SNPID].map(
-                            finemap_pp
-                        )
-                    else:
-                        self.logger.warning(f"LD matrix {ld_matrix} does not exist, skip {method}")
-                        out_sumstats[ColName.PP_FINEMAP] = np.nan
-                elif method == "paintor":
-                    if os.path.exists(ld_matrix):
-                        paintor_pp = self.run_paintor(sumstats=ld_ol, ld_matrix=ld_matrix, **kwargs)
-                        out_sumstats[ColName.PP_PAINTOR] = out_sumstats[ColName.SNPID].map(
-                            paintor_pp
-                        )
-                    else:
-                        self.logger.warning(f"LD matrix {ld_matrix} does not exist, skip {method}")
-                        out_sumstats[ColName.PP_PAINTOR] = np.nan
-                elif method == "caviarbf":
-                    if os.path.exists(ld_matrix):
-                        caviarbf_pp = self.run_caviarbf(
-                            sumstats=ld_ol, ld_matrix=ld_matrix, **kwargs
-                        )
-                        out_sumstats[ColName.PP_CAVIARBF] = out_sumstats[ColName.SNPID].map(
-                            caviarbf_pp
-                        )
-                    else:
-                        self.logger.warning(f"LD matrix {ld_matrix} does not exist, skip {method}")
-                        out_sumstats[ColName.PP_CAVIARBF] = np.nan
-                elif method == "susie":
-                    if os.path.exists(ld_matrix):
-                        susie_pp = self.run_susie(
-                            sumstats=ld_ol, ld_matrix=ld_matrix, prior_file=None, **kwargs
-                        )
-                        out_sumstats[ColName.PP_SUSIE] = out_sumstats[ColName.SNPID].map(susie_pp)
-                    else:
-                        self.logger.warning(f"LD matrix {ld_matrix} does not exist, skip {method}")
-                        out_sumstats[ColName.PP_SUSIE] = np.nan
-                elif method == "polyfun_finemap":
-                    if os.path.exists(ld_matrix):
-                        polyfun_finemap_pp = self.run_finemap(
-                            sumstats=ld_ol, ld_matrix=ld_matrix, prior_file=prior_file, **kwargs
-                        )
-                        out_sumstats[ColName.PP_POLYFUN_FINEMAP] = out_sumstats[ColName.SNPID].map(
-                            polyfun_finemap_pp
-                        )
-                    else:
-                        self.logger.warning(f"LD matrix {ld_matrix} does not exist, skip {method}")
-                        out_sumstats[ColName.PP_POLYFUN_FINEMAP] = np.nan
-                elif method == "polyfun_susie":
-                    if os.path.exists(ld_matrix):
-                        polyfun_susie_pp = self.run_susie(
-                            sumstats=ld_ol, ld_matrix=ld_matrix, prior_file=prior_file, **kwargs
-                        )
-                        out_sumstats[ColName.PP_POLYFUN_SUSIE] = out_sumstats[ColName.SNPID].map(
-                            polyfun_susie_pp
-                        )
-                    else:
-                        self.logger.warning(f"LD matrix {ld_matrix} does not exist, skip {method}")
-                        out_sumstats[ColName.PP_POLYFUN_SUSIE] = np.nan
-            else:
+            if method not in allowed_methods:
                 raise ValueError(f"Method {method} is not supported")
+        out_sumstats = self._run_methods(
+            out_sumstats=out_sumstats,
+            fm_input=fm_input_ol,
+            ld_ol=ld_ol,
+            methods=methods,
+            ld_methods=[method for method in methods if method in methods_required_ld],
+            prior_file=prior_file,
+            temp_dir=temp_dir,
+            tool_threads=tool_threads,
+            **kwargs,
+        )
 
         credible_set = self.get_credset(finemap_res=out_sumstats, **kwargs)
         credible_set[ColName.LEAD_SNP] = lead_snp
@@ -840,9 +1024,15 @@ class EasyFinemap(object):
         """
         return self.finemap_locus(**kwargs)
 
+    def _finemap_locus_indexed(self, item: Tuple[int, dict]) -> Tuple[int, pd.DataFrame]:
+        """Perform finemapping for the i-th locus, returned with i, so the results can come back in any order."""
+        i, kwargs = item
+        return i, self.finemap_locus(**kwargs)
+
+    @classmethod
     def finemap_all_loci(
-        self,
-        sumstats: pd.DataFrame,
+        cls,
+        sumstats: Union[str, pd.DataFrame],
         loci: pd.DataFrame,
         lead_snps: pd.DataFrame,
         methods: List[str],
@@ -862,10 +1052,12 @@ class EasyFinemap(object):
         """
         Perform finemapping for all loci.
 
+        The workers share one `EasyFinemap` instance, so this can be called on the class directly.
+
         Parameters
         ----------
-        sumstats : pd.DataFrame
-            Summary statistics.
+        sumstats : Union[str, pd.DataFrame]
+            Path to the tabix-indexed summary statistics, or the summary statistics already loaded.
         loci : pd.DataFrame
             Loci.
         lead_snps : pd.DataFrame
@@ -893,9 +1085,11 @@ class EasyFinemap(object):
         use_ref_EAF : bool, optional
             Use reference EAF, by default False
         outfile : Optional[str], optional
-            Output file, by default None
+            Output file, by default None. With more than one thread, the loci are written in the order they finish,
+            the LEAD_SNP column tells them apart. The returned DataFrame keeps the order of `loci`.
         threads : int, optional
-            Number of threads, by default 1
+            Number of threads, by default 1. The loci run in up to `threads` processes, with fewer loci than
+            threads the remaining threads run the external tools of a locus concurrently.
         """
         # sumstats = sg.make_SNPID_unique(sumstats, ColName.CHR, ColName.BP, ColName.EA, ColName.NEA)
         if (
@@ -905,12 +1099,35 @@ class EasyFinemap(object):
             and len(methods) == 1
         ):
             credible_method = methods[0]
+        if conditional:
+            lead_snps = cls._index_lead_snps(lead_snps)
+        if isinstance(sumstats, pd.DataFrame):
+            # sorted once, the SNPs of each locus are then a contiguous slice found by binary search
+            sumstats = sumstats.sort_values([ColName.CHR, ColName.BP], kind="stable", ignore_index=True)
+            chroms = sumstats[ColName.CHR].to_numpy()
+            bps = sumstats[ColName.BP].to_numpy()
+        # no more workers than loci, and no pool at all for a single worker,
+        # which saves the process start-up and pickling every locus's arguments
+        n_workers = max(1, min(threads, len(loci)))
+        # the threads left over by the workers run the external tools of a locus concurrently,
+        # so no more than `threads` tools run at the same time
+        tool_threads = max(1, threads // n_workers)
         kwargs_list = []
         for chrom, start, end, lead_snp in loci[
             [ColName.CHR, ColName.START, ColName.END, ColName.LEAD_SNP]
-        ].values:
+        ].itertuples(index=False, name=None):
+            if isinstance(sumstats, pd.DataFrame):
+                # each worker only gets the SNPs of its locus pickled, not the whole sumstats
+                chr_start = np.searchsorted(chroms, chrom, side="left")
+                chr_end = np.searchsorted(chroms, chrom, side="right")
+                chr_bps = bps[chr_start:chr_end]
+                locus_start = chr_start + np.searchsorted(chr_bps, start, side="left")
+                locus_end = chr_start + np.searchsorted(chr_bps, end, side="right")
+                locus_sumstats = sumstats.iloc[locus_start:locus_end]
+            else:
+                locus_sumstats = sumstats
             kwargs = {
-                "sumstats": sumstats,
+                "sumstats": locus_sumstats,
                 "chrom": chrom,
                 "start": start,
                 "end": end,
@@ -927,9 +1144,10 @@ class EasyFinemap(object):
                 "credible_threshold": credible_threshold,
                 "credible_method": credible_method,
                 "use_ref_EAF": use_ref_EAF,
+                "tool_threads": tool_threads,
             }
             kwargs_list.append(kwargs)
-        ef = EasyFinemap()
+        ef = cls()
         # output = []
         # with Progress(
         #     TextColumn("{task.description}"),
@@ -960,18 +1178,40 @@ class EasyFinemap(object):
         #             progress.refresh()
         #             output.append(_)
         # output_df = pd.concat(output, ignore_index=True)
-        with Pool(threads) as p:
-            output = []
-            for result in tqdm(
-                p.imap(ef.finemap_locus_parallel, kwargs_list),
-                total=len(kwargs_list),
-                position=0,
-                leave=True,
-                desc="Perform Fine-mapping...",
-            ):
-                output.append(result)
-        output_df = pd.concat(output, ignore_index=True)
+
+        def iter_results():
+            """Yield the locus index and result of each locus as soon as it finishes."""
+            if n_workers == 1:
+                yield from enumerate(map(ef.finemap_locus_parallel, kwargs_list))
+            else:
+                # the loci are sent in chunks to cut the pickling round-trips, and taken back in the order
+                # they finish, so a slow locus does not hold back the results after it
+                chunksize = max(1, len(kwargs_list) // (n_workers * 4))
+                # workers are replaced after a few tasks, so the memory they pile up is given back,
+                # and leaving the block terminates the pool, so an error does not wait for the queued loci
+                with Pool(processes=n_workers, maxtasksperchild=4) as pool:
+                    yield from pool.imap_unordered(
+                        ef._finemap_locus_indexed, enumerate(kwargs_list), chunksize=chunksize
+                    )
+
+        results = tqdm(iter_results(), total=len(kwargs_list), position=0, leave=True, desc="Perform Fine-mapping...")
         if outfile:
-            output_df.to_csv(outfile, sep="\t", index=False, float_format="%0.6g")
+            # write each locus as it finishes, the results of all loci are never held together
+            for n_written, (_, result) in enumerate(results):
+                if n_written == 0:
+                    columns = result.columns
+                elif not result.columns.equals(columns):
+                    result = result.reindex(columns=columns)
+                result.to_csv(
+                    outfile,
+                    sep="\t",
+                    index=False,
+                    float_format="%0.6g",
+                    mode="w" if n_written == 0 else "a",
+                    header=n_written == 0,
+                )
         else:
-            return output_df
+            output: List[Optional[pd.DataFrame]] = [None] * len(kwargs_list)
+            for i, result in results:
+                output[i] = result
+            return pd.concat(output, ignore_index=True)
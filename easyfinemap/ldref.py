@@ -20,9 +20,9 @@ import numpy as np
 import pandas as pd
 from pathos.multiprocessing import ProcessingPool as Pool
 
-from easyfinemap.constant import CHROMS, ColName
+from easyfinemap.constant import CHROMS_TUPLE, ColName
 from easyfinemap.tools import Tools
-from easyfinemap.utils import io_in_tempdir, make_SNPID_unique
+from easyfinemap.utils import io_in_tempdir, make_SNPID_unique, write_cojo_ma, write_space_sep
 
 
 class LDRef:
@@ -175,7 +175,7 @@ class LDRef:
             raise ValueError(f"Unsupported file type: {file_type}")
 
         params: List[List[Union[str, int]]] = [[] for _ in range(3)]
-        for chrom in CHROMS:
+        for chrom in CHROMS_TUPLE:
             if "{chrom}" in ldref_path:
                 inprefix = ldref_path.replace("{chrom}", str(chrom))
                 if not os.path.exists(f"{inprefix}.bed"):
@@ -316,7 +316,7 @@ class LDRef:
         """
         if not os.path.exists(f"{ldref}.bim"):
             raise FileNotFoundError(f"{ldref}.bim not found.")
-        sumstats[ColName.SNPID].to_csv(f"{temp_dir}/overlap_snpid.txt", index=False, header=False)
+        write_space_sep(f"{temp_dir}/overlap_snpid.txt", {ColName.SNPID: sumstats[ColName.SNPID]}, ["%s"], header=False)
         cmd = [
             self.plink,
             "--bfile",
@@ -369,13 +369,12 @@ class LDRef:
                 overlap_sumstat['MAF'] = freq['MAF']
             return overlap_sumstat
 
-    @io_in_tempdir('./tmp/ldref')
     def make_ld(
         self,
         ldref: str,
         outprefix: str,
         **kwargs,
-    ):
+    ) -> bool:
         """
         Make the LD matrix.
 
@@ -395,7 +394,8 @@ class LDRef:
 
         Returns
         -------
-        None
+        bool
+            Whether the LD matrix `{outprefix}.ld` is made.
         """
         self.logger.info(f"Making LD matrix: {outprefix}")
         cmd = [
@@ -415,12 +415,14 @@ class LDRef:
         if res.returncode != 0:
             self.logger.warning(res.stderr)
             self.logger.warning(f'see log file: {outprefix}.log for details')
+            return False
         else:
             self.logger.debug("LD matrix is made")
             run(["sed", "-i", "s/nan/1e-6/g", f"{outprefix}.ld"])
             # matrix = np.loadtxt(f"{outprefix}.ld")
             # matrix[np.isnan(matrix)] = 1e-6
             # np.savetxt(f"{outprefix}.ld", matrix)
+            return True
 
     @io_in_tempdir('./tmp/ldref')
     def cojo_cond(
@@ -471,35 +473,8 @@ class LDRef:
         # all_sumstats.sort_values(by=[ColName.CHR, ColName.BP], inplace=True)
         # all_sumstats.reset_index(drop=True, inplace=True)
         # cojo_input = ld.intersect(all_sumstats, ldref, f"{temp_dir}/cojo_input_{chrom}", use_ref_EAF)
-        cojo_input = sumstats.copy()
-        cojo_input[ColName.N] = sample_size
-        cojo_input = cojo_input[
-            [
-                ColName.SNPID,
-                ColName.EA,
-                ColName.NEA,
-                ColName.EAF,
-                ColName.BETA,
-                ColName.SE,
-                ColName.P,
-                ColName.N,
-            ]
-        ]
-        cojo_input.rename(
-            columns={
-                ColName.SNPID: "SNP",
-                ColName.EA: "A1",
-                ColName.NEA: "A2",
-                ColName.EAF: "freq",
-                ColName.BETA: "b",
-                ColName.SE: "se",
-                ColName.P: "p",
-                ColName.N: "N",
-            },
-            inplace=True,
-        )
         cojo_p_file = f"{temp_dir}/cojo_input_{chrom}.ma"
-        cojo_input.to_csv(cojo_p_file, sep=" ", index=False)
+        write_cojo_ma(cojo_p_file, sumstats, sample_size)
         with open(f"{temp_dir}/cojo_cond_{chrom}.snps", "w") as f:
             f.write('\n'.join(cond_snps[ColName.SNPID].tolist()))
         cojo_outfile = f"{temp_dir}/cojo_{chrom}.cond"
@@ -528,8 +503,10 @@ class LDRef:
                 self.logger.warning(
                     'there is a collinearity problem of the given list of SNPs. Try slct again'
                 )
-                cojo_input[cojo_input['SNP'].isin(cond_snps[ColName.SNPID])].to_csv(
-                    f"{temp_dir}/cojo_{chrom}.reslct.ma", sep=" ", index=False
+                write_cojo_ma(
+                    f"{temp_dir}/cojo_{chrom}.reslct.ma",
+                    sumstats[sumstats[ColName.SNPID].isin(cond_snps[ColName.SNPID])],
+                    sample_size,
                 )
                 cmd = [
                     self.gcta,
@@ -592,7 +569,7 @@ class LDRef:
                 },
                 inplace=True,
             )
-            output = sumstats.merge(cond_res, on=ColName.SNPID, how="left")
+            output = sumstats.merge(cond_res, on=ColName.SNPID, how="left", sort=False)
             output = output.dropna(subset=[ColName.COJO_P, ColName.COJO_BETA, ColName.COJO_SE])
             return output
         else:
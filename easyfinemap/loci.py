@@ -19,27 +19,37 @@ from typing import List, Optional, Tuple, Union
 import pandas as pd
 from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn, TimeElapsedColumn
 
-from easyfinemap.constant import ColName
+from easyfinemap.constant import LOCI_COLS, ColName
 from easyfinemap.ldref import LDRef
 
 from easyfinemap.tools import Tools
-from easyfinemap.utils import get_significant_snps, io_in_tempdir, make_SNPID_unique
+from easyfinemap.utils import get_significant_snps, io_in_tempdir, make_SNPID_unique, write_cojo_ma
+
+logger = logging.getLogger("Loci")
 
 
 class Loci:
     """Identify the independent loci."""
 
+    # method name -> the classmethod identifying the independent lead snps
+    LEAD_SNP_METHODS = {
+        "distance": "_lead_snps_by_distance",
+        "clumping": "_lead_snps_by_clumping",
+        "conditional": "_lead_snps_by_conditional",
+    }
+
     def __init__(self):
         """Initialize the Loci class."""
-        self.logger = logging.getLogger("Loci")
+        self.logger = logger
         self.plink = Tools().plink
         self.gcta = Tools().gcta
         self.tmp_root = Path.cwd() / "tmp" / "loci"
         if not self.tmp_root.exists():
             self.tmp_root.mkdir(parents=True)
 
+    @classmethod
     def identify_indep_loci(
-        self,
+        cls,
         sumstats: pd.DataFrame,
         sig_threshold: float = 5e-8,
         loci_extend: int = 500,
@@ -62,10 +72,15 @@ class Loci:
         """
         Identify the independent loci.
 
+        The distance method does not need plink or gcta, `Loci` is only instantiated for the
+        clumping and conditional methods, so this can be called on the class directly.
+
         Parameters
         ----------
         sumstats : pd.DataFrame
-            The input summary statistics.
+            The input summary statistics. The distance and clumping methods only use the SNPs with
+            P-value below `sig_threshold`, so the input can be filtered beforehand, e.g. while reading.
+            The conditional method needs all the SNPs.
         sig_threshold : float, optional
             The pvalue threshold, by default 5e-8
         loci_extend : int, optional
@@ -106,50 +121,96 @@ class Loci:
         sumstats = make_SNPID_unique(sumstats)
         if ldblock is not None:
             ldblock = pd.read_csv(ldblock, sep="\t", names=[ColName.CHR, ColName.START, ColName.END])
-        if method == "distance":
-            sig_df = get_significant_snps(sumstats, sig_threshold)
-            lead_snp = self.indep_snps_by_distance(sig_df, distance, ldblock)
-        elif method == "clumping":
-            clump_p1 = sig_threshold
-            if ldref is not None:
-                sig_df = get_significant_snps(sumstats, sig_threshold)
-                lead_snp = self.indep_snps_by_ldclumping(sig_df, ldref, clump_p1, clump_kb, clump_r2)
-            else:
-                raise ValueError(f"Please provide the ldref file for method: {method}")
-        elif method == "conditional":
-            if ldref is None:
-                raise ValueError("Please provide the ldref file for conditional analysis.")
-            if sample_size is None:
-                raise ValueError("Please provide the sample size for conditional analysis.")
-            else:
-                lead_snp = self.indep_snps_by_conditional(
-                    sumstats,
-                    ldref,
-                    sample_size,
-                    sig_threshold,
-                    cojo_window_kb,
-                    cojo_collinear,
-                    diff_freq,
-                    use_ref_EAF,
-                    only_use_sig_snps,
-                    ldblock,
-                    threads,
-                )
-        else:
+        if method not in cls.LEAD_SNP_METHODS:
             raise ValueError(f"Unsupported method: {method}")
-        loci = self.leadsnp2loci(lead_snp, loci_extend, if_merge, ldblock)
+        lead_snp = getattr(cls, cls.LEAD_SNP_METHODS[method])(
+            sumstats=sumstats,
+            sig_threshold=sig_threshold,
+            ldblock=ldblock,
+            ldref=ldref,
+            distance=distance,
+            clump_kb=clump_kb,
+            clump_r2=clump_r2,
+            sample_size=sample_size,
+            cojo_window_kb=cojo_window_kb,
+            cojo_collinear=cojo_collinear,
+            diff_freq=diff_freq,
+            use_ref_EAF=use_ref_EAF,
+            only_use_sig_snps=only_use_sig_snps,
+            threads=threads,
+        )
+        loci = cls.leadsnp2loci(lead_snp, loci_extend, if_merge, ldblock)
         if if_merge and ColName.COJO_BETA in lead_snp.columns:
-            self.logger.warning("The loci identified by cojo may not need merge.")
+            logger.warning("The loci identified by cojo may not need merge.")
             lead_snp = lead_snp[lead_snp[ColName.SNPID].isin(loci[ColName.LEAD_SNP])]
         if outprefix:
             loci_file = f"{outprefix}.loci.txt"
             loci.to_csv(loci_file, sep="\t", index=False, float_format="%.6g")
-            self.logger.info(f"Save {len(loci)} independent loci to {loci_file}")
+            logger.info(f"Save {len(loci)} independent loci to {loci_file}")
             leadsnp_file = f"{outprefix}.leadsnp.txt"
             lead_snp.to_csv(leadsnp_file, sep="\t", index=False, float_format="%.6g")
-            self.logger.info(f"Save {len(lead_snp)} independent lead snps to {leadsnp_file}")
+            logger.info(f"Save {len(lead_snp)} independent lead snps to {leadsnp_file}")
         return lead_snp, loci
 
+    @classmethod
+    def _lead_snps_by_distance(
+        cls, sumstats: pd.DataFrame, sig_threshold: float, distance: int, ldblock: Optional[pd.DataFrame], **kwargs
+    ) -> pd.DataFrame:
+        """Identify the independent lead snps by distance, see `indep_snps_by_distance`."""
+        sig_df = get_significant_snps(sumstats, sig_threshold)
+        return cls.indep_snps_by_distance(sig_df, distance, ldblock)
+
+    @classmethod
+    def _lead_snps_by_clumping(
+        cls,
+        sumstats: pd.DataFrame,
+        sig_threshold: float,
+        ldref: Optional[str],
+        clump_kb: int,
+        clump_r2: float,
+        **kwargs,
+    ) -> pd.DataFrame:
+        """Identify the independent lead snps by LD clumping, see `indep_snps_by_ldclumping`."""
+        if ldref is None:
+            raise ValueError("Please provide the ldref file for method: clumping")
+        sig_df = get_significant_snps(sumstats, sig_threshold)
+        return cls().indep_snps_by_ldclumping(sig_df, ldref, sig_threshold, clump_kb, clump_r2)
+
+    @classmethod
+    def _lead_snps_by_conditional(
+        cls,
+        sumstats: pd.DataFrame,
+        sig_threshold: float,
+        ldref: Optional[str],
+        sample_size: Optional[int],
+        cojo_window_kb: int,
+        cojo_collinear: float,
+        diff_freq: float,
+        use_ref_EAF: bool,
+        only_use_sig_snps: bool,
+        ldblock: Optional[pd.DataFrame],
+        threads: int,
+        **kwargs,
+    ) -> pd.DataFrame:
+        """Identify the independent lead snps by conditional analysis, see `indep_snps_by_conditional`."""
+        if ldref is None:
+            raise ValueError("Please provide the ldref file for conditional analysis.")
+        if sample_size is None:
+            raise ValueError("Please provide the sample size for conditional analysis.")
+        return cls().indep_snps_by_conditional(
+            sumstats,
+            ldref,
+            sample_size,
+            sig_threshold,
+            cojo_window_kb,
+            cojo_collinear,
+            diff_freq,
+            use_ref_EAF,
+            only_use_sig_snps,
+            ldblock,
+            threads,
+        )
+
     @staticmethod
     def merge_overlapped_loci(loci_df: pd.DataFrame):
         """
@@ -497,7 +558,6 @@ class Loci:
         chrom = sumstats[ColName.CHR].unique()[0]
         if not use_ref_EAF and sumstats[ColName.EAF].isnull().any():
             raise ValueError(f"{ColName.EAF} is not in the sumstats, please set use_ref_EAF to True")
-        cojo_input = sumstats.copy()
         ld = LDRef()
         cojo_input = ld.intersect(sumstats, ldref, f"{temp_dir}/cojo_input_{chrom}", use_ref_EAF)
         if cojo_input.empty:
@@ -505,25 +565,8 @@ class Loci:
             self.logger.warning("Use the most significant SNP as the independent lead SNP.")
             cojo_snps = sumstats.loc[sumstats.index == sumstats[ColName.P].idxmin()].copy()
         else:
-            cojo_input[ColName.N] = sample_size
-            cojo_input = cojo_input[
-                [ColName.SNPID, ColName.EA, ColName.NEA, ColName.EAF, ColName.BETA, ColName.SE, ColName.P, ColName.N]
-            ]
-            cojo_input.rename(
-                columns={
-                    ColName.SNPID: "SNP",
-                    ColName.EA: "A1",
-                    ColName.NEA: "A2",
-                    ColName.EAF: "freq",
-                    ColName.BETA: "b",
-                    ColName.SE: "se",
-                    ColName.P: "p",
-                    ColName.N: "N",
-                },
-                inplace=True,
-            )
             cojo_p_file = f"{temp_dir}/cojo_input_{chrom}.ma"
-            cojo_input.to_csv(cojo_p_file, sep=" ", index=False)
+            write_cojo_ma(cojo_p_file, cojo_input, sample_size)
             cojo_outfile = f"{temp_dir}/cojo_{chrom}.slct"
             cmd = [
                 self.gcta,
@@ -565,7 +608,7 @@ class Loci:
                         inplace=True,
                     )
                     cojo_snps = cojo_snps[cojo_snps[ColName.COJO_P] <= sig_threshold]
-                    cojo_snps = sumstats.merge(cojo_snps, on=ColName.SNPID, how="inner")
+                    cojo_snps = sumstats.merge(cojo_snps, on=ColName.SNPID, how="inner", sort=False)
                 else:
                     self.logger.warning(f"No conditional snps found for chromosome {chrom}")
                     self.logger.warning("Use the most significant SNP as the independent lead SNP.")
@@ -618,7 +661,7 @@ class Loci:
             loci_df[ColName.START] = loci_df[ColName.LEAD_SNP_BP] - range
             loci_df[ColName.START] = loci_df[ColName.START].apply(lambda x: 1 if x <= 0 else x)
             loci_df[ColName.END] = loci_df[ColName.LEAD_SNP_BP] + range
-        loci_df = loci_df[ColName.loci_cols].copy()
+        loci_df = loci_df[list(LOCI_COLS)]
         if if_merge:
             loci_df = Loci.merge_overlapped_loci(loci_df)
         loci_df = loci_df.sort_values(by=[ColName.CHR, ColName.START, ColName.END])
@@ -1,14 +1,56 @@
 """Utils for easyfinemap."""
 
+import gzip
 import logging
 import os
 import shutil
+import signal
 import tempfile
+from contextlib import contextmanager
 from functools import wraps
+from pathlib import Path
+from subprocess import PIPE, Popen
+from typing import Dict, Optional, Sequence, Union
 
+import numpy as np
 import pandas as pd
 
-from easyfinemap.constant import ColName
+from easyfinemap import constant
+from easyfinemap.constant import SCHEMA_BOUNDS, SUMSTAT_DTYPES, SUMSTAT_SCHEMA, ColName
+
+# the sumstat dtypes as numpy dtype objects, built once and handed to pd.read_csv as is,
+# kept here rather than on ColSpec so that importing constant.py does not import numpy
+READ_CSV_DTYPES = {name: np.dtype(spec.dtype) for name, spec in SUMSTAT_SCHEMA.items()}
+
+# the missing value spellings of pd.read_csv, for the readers that do not recognise all of them
+CSV_NA_VALUES = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+]
+
+# SCHEMA_BOUNDS as parallel arrays aligned by column index, for vectorized checks over the columns
+COL_NAMES = np.array(list(SCHEMA_BOUNDS), dtype=object)
+COL_MIN, COL_MAX, COL_ALLOW_NAN, COL_NONZERO = (np.array(field) for field in zip(*SCHEMA_BOUNDS.values()))
+COL_ALLOW_NAN = COL_ALLOW_NAN.astype(bool)
+COL_NONZERO = COL_NONZERO.astype(bool)
+COL_IDX = {name: i for i, name in enumerate(COL_NAMES)}
 
 
 def get_significant_snps(df: pd.DataFrame, pvalue_threshold: float = 5e-8, use_most_sig_if_no_sig: bool = True):
@@ -29,10 +71,11 @@ def get_significant_snps(df: pd.DataFrame, pvalue_threshold: float = 5e-8, use_m
     pd.DataFrame
         The significant snps, sorted by pvalue.
     """
-    sig_df = df.loc[df[ColName.P] < pvalue_threshold].copy()
+    pvalues = df[ColName.P].to_numpy()
+    sig_df = df.loc[pvalues < pvalue_threshold].copy()
     if sig_df.empty:
         if use_most_sig_if_no_sig:
-            sig_df = df.loc[df[ColName.P] == df[ColName.P].min()].copy()
+            sig_df = df.loc[pvalues == np.nanmin(pvalues)].copy()
             logging.debug(f"Use the most significant SNP: {sig_df[ColName.SNPID].values[0]}")
             logging.debug(f"pvalue: {sig_df[ColName.P].values[0]}")
         else:
@@ -43,6 +86,37 @@ def get_significant_snps(df: pd.DataFrame, pvalue_threshold: float = 5e-8, use_m
     return sig_df
 
 
+def get_out_of_bounds(df: pd.DataFrame) -> np.ndarray:
+    """
+    Get the rows with any numeric column out of its bounds in `SUMSTAT_SCHEMA`.
+
+    A value is out of bounds if it is below the minimum or above the maximum, missing in a column
+    not allowing missing values, or zero in a column requiring non-zero values.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The input summary statistics.
+
+    Returns
+    -------
+    np.ndarray
+        The boolean mask of the rows with any value out of bounds.
+    """
+    mask = np.zeros(len(df), dtype=bool)
+    for name in df.columns:
+        if name not in COL_IDX:
+            continue
+        i = COL_IDX[name]
+        values = df[name].to_numpy(dtype=np.float64, na_value=np.nan)
+        mask |= (values < COL_MIN[i]) | (values > COL_MAX[i])
+        if not COL_ALLOW_NAN[i]:
+            mask |= np.isnan(values)
+        if COL_NONZERO[i]:
+            mask |= values == 0
+    return mask
+
+
 def make_SNPID_unique(sumstat: pd.DataFrame, replace_rsIDcol: bool = False, remove_duplicates: bool = True):
     """
     Make the SNPID unique.
@@ -94,10 +168,108 @@ def make_SNPID_unique(sumstat: pd.DataFrame, replace_rsIDcol: bool = False, remo
     return df
 
 
+def write_space_sep(path: str, columns: Dict[str, Sequence], fmts: Sequence[str], header: bool = True) -> None:
+    """
+    Write the columns as a space-separated text file, the input format of the fine-mapping tools.
+
+    All rows are formatted with one printf-style row template and written in a single call,
+    which is much faster than `pd.DataFrame.to_csv` for the few columns the tools need.
+    Missing values are written as empty fields, as `pd.DataFrame.to_csv` does.
+
+    Parameters
+    ----------
+    path : str
+        The output path.
+    columns : Dict[str, Sequence]
+        The column names and values, e.g. Series or arrays of the same length.
+    fmts : Sequence[str]
+        The printf-style format of each column, e.g. "%s", "%d", "%.5f".
+    header : bool, optional
+        Whether to write the column names as the first line, by default True
+    """
+    values = [np.asarray(col) for col in columns.values()]
+    missing = [np.asarray(pd.isna(col), dtype=bool) for col in values]
+    with open(path, "w") as f:
+        if header:
+            f.write(" ".join(columns) + "\n")
+        if not any(na.any() for na in missing):
+            row_fmt = " ".join(fmts) + "\n"
+            f.write("".join(map(row_fmt.__mod__, zip(*(col.tolist() for col in values)))))
+        else:
+            # "%d" and "%.6g" cannot format None or pd.NA, and would write NaN as "nan",
+            # so the columns are formatted one by one, skipping the missing values
+            fields = [
+                ["" if na else fmt % value for value, na in zip(col.tolist(), col_na.tolist())]
+                for col, col_na, fmt in zip(values, missing, fmts)
+            ]
+            f.write("".join(" ".join(row) + "\n" for row in zip(*fields)))
+
+
+def read_space_sep(path: str, dtype: Dict, usecols: Optional[Sequence] = None, header="infer") -> pd.DataFrame:
+    """
+    Read a space-separated output file of the fine-mapping tools.
+
+    The file is parsed by pyarrow's multithreaded reader if pyarrow is installed, otherwise by pandas' C reader.
+
+    Parameters
+    ----------
+    path : str
+        The file path.
+    dtype : Dict
+        The dtype of each column read, so no type inference is needed.
+    usecols : Optional[Sequence], optional
+        The columns to read, by default None, read all columns
+    header : optional
+        The header row, by default "infer", None for files without header
+
+    Returns
+    -------
+    pd.DataFrame
+        The file content.
+    """
+    try:
+        import pyarrow  # noqa: F401
+
+        engine = "pyarrow"
+    except ImportError:
+        engine = "c"
+    return pd.read_csv(path, sep=" ", usecols=usecols, dtype=dtype, header=header, engine=engine)
+
+
+def write_cojo_ma(path: str, sumstats: pd.DataFrame, sample_size: int) -> None:
+    """
+    Write the summary statistics as a GCTA-COJO .ma file.
+
+    Parameters
+    ----------
+    path : str
+        The output path.
+    sumstats : pd.DataFrame
+        The summary statistics, with SNPID, EA, NEA, EAF, BETA, SE and P columns.
+    sample_size : int
+        The sample size, written as the N column.
+    """
+    columns = {
+        "SNP": sumstats[ColName.SNPID],
+        "A1": sumstats[ColName.EA],
+        "A2": sumstats[ColName.NEA],
+        "freq": sumstats[ColName.EAF],
+        "b": sumstats[ColName.BETA],
+        "se": sumstats[ColName.SE],
+        "p": sumstats[ColName.P],
+        "N": np.full(len(sumstats), sample_size),
+    }
+    write_space_sep(path, columns, ["%s", "%s", "%s", "%.6g", "%.6g", "%.6g", "%.6g", "%d"])
+
+
 def io_in_tempdir(dir='./tmp'):
     """
     Make tempdir for process.
 
+    A new tempdir is made for each call and passed to the function as `temp_dir`.
+    If the caller passes `temp_dir` itself, it is used as is and left for the caller to remove,
+    so the steps of a locus share the locus tempdir.
+
     Parameters
     ----------
     dir : str, optional
@@ -112,6 +284,8 @@ def io_in_tempdir(dir='./tmp'):
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
+            if kwargs.get("temp_dir") is not None:
+                return func(*args, **kwargs)
             temp_dir = tempfile.mkdtemp(dir=dir)
             logger = logging.getLogger("IO")
             logger.debug(f"Tempdir: {temp_dir}")
@@ -128,3 +302,161 @@ def io_in_tempdir(dir='./tmp'):
         return wrapper
 
     return decorator
+
+
+@contextmanager
+def open_maybe_gz(path):
+    """
+    Open a file for binary reading, decompressing it if it ends with `.gz`.
+
+    Gzipped files are decompressed with ISA-L (`isal`) if installed, otherwise
+    with a `zcat` subprocess, both of which are much faster than Python's gzip
+    module. Python's gzip module is only used if neither is available.
+
+    Parameters
+    ----------
+    path : str or Path
+        The path to the file.
+
+    Yields
+    ------
+    BinaryIO
+        The file handle of the decompressed content.
+
+    Raises
+    ------
+    EOFError
+        If the gzipped file is truncated or corrupted.
+    """
+    path = str(path)
+    if not path.endswith(".gz"):
+        with open(path, "rb") as fh:
+            yield fh
+        return
+    try:
+        from isal import igzip_threaded
+    except ImportError:
+        pass
+    else:
+        with igzip_threaded.open(path, "rb") as fh:
+            yield fh
+        return
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No such file: {path}")
+    try:
+        proc = Popen(["zcat", path], stdout=PIPE, stderr=PIPE)
+    except FileNotFoundError:
+        with gzip.open(path, "rb") as fh:
+            yield fh
+        return
+
+    def check_zcat():
+        """Raise EOFError like the gzip module if zcat failed, e.g. on a truncated file."""
+        proc.stdout.close()  # type: ignore
+        stderr = proc.stderr.read().decode(errors="replace").strip()  # type: ignore
+        proc.stderr.close()  # type: ignore
+        # SIGPIPE only means the caller stopped reading early
+        if proc.wait() not in (0, -signal.SIGPIPE):
+            raise EOFError(f"Failed to decompress {path}: {stderr}")
+
+    try:
+        yield proc.stdout
+    except Exception:
+        # a parse error on a truncated stream is reported as the decompression error
+        check_zcat()
+        raise
+    check_zcat()
+
+
+def _read_sumstats(sumstats_path: str, pvalue_threshold: Optional[float]) -> pd.DataFrame:
+    """Read the summary statistics, see `load_sumstats`."""
+    suffix = Path(sumstats_path).suffix
+    if suffix in {".parquet", ".pq"}:
+        if pvalue_threshold is None:
+            return pd.read_parquet(sumstats_path)
+        # the filter runs at IO time, row groups without significant SNPs are never loaded
+        sig_df = pd.read_parquet(sumstats_path, filters=[(ColName.P, "<", pvalue_threshold)])
+        if sig_df.empty:
+            min_p = pd.read_parquet(sumstats_path, columns=[ColName.P])[ColName.P].min()
+            sig_df = pd.read_parquet(sumstats_path, filters=[(ColName.P, "==", min_p)])
+        return sig_df
+    if suffix == ".feather":
+        return pd.read_feather(sumstats_path)
+    if suffix != ".gz":
+        try:
+            import polars as pl
+            import pyarrow  # noqa: F401, polars needs pyarrow to convert to pandas
+        except ImportError:
+            pass
+        else:
+            pl_dtypes = {"int8": pl.Int8, "int32": pl.Int32, "float64": pl.Float64}
+            schema = {col: pl_dtypes[dtype] for col, dtype in SUMSTAT_DTYPES.items()}
+            lazy_df = pl.scan_csv(
+                sumstats_path, separator="\t", schema_overrides=schema, null_values=CSV_NA_VALUES
+            )
+            if pvalue_threshold is None:
+                return lazy_df.collect().to_pandas()
+            sig_df = lazy_df.filter(pl.col(ColName.P) < pvalue_threshold).collect()
+            if sig_df.is_empty():
+                sig_df = lazy_df.filter(pl.col(ColName.P) == pl.col(ColName.P).min()).collect()
+            return sig_df.to_pandas()
+    with open_maybe_gz(sumstats_path) as fh:
+        if pvalue_threshold is not None:
+            sig_chunks, min_chunks = [], []
+            for chunk in pd.read_csv(fh, sep="\t", dtype=READ_CSV_DTYPES, chunksize=1_000_000):
+                sig_chunks.append(chunk[chunk[ColName.P] < pvalue_threshold])
+                min_chunks.append(chunk[chunk[ColName.P] == chunk[ColName.P].min()])
+            sig_df = pd.concat(sig_chunks, ignore_index=True)
+            if sig_df.empty:
+                min_df = pd.concat(min_chunks, ignore_index=True)
+                sig_df = min_df[min_df[ColName.P] == min_df[ColName.P].min()].reset_index(drop=True)
+            return sig_df
+        arrow_schema = constant.SUMSTAT_ARROW_SCHEMA
+        if arrow_schema is None:
+            return pd.read_csv(fh, sep="\t", dtype=READ_CSV_DTYPES)
+        from pyarrow import csv
+
+        table = csv.read_csv(
+            fh,
+            parse_options=csv.ParseOptions(delimiter="\t"),
+            # empty strings are missing values, as in pandas
+            convert_options=csv.ConvertOptions(
+                column_types=arrow_schema, null_values=CSV_NA_VALUES, strings_can_be_null=True
+            ),
+        )
+        return table.to_pandas()
+
+
+def load_sumstats(sumstats_path: Union[str, Path], pvalue_threshold: Optional[float] = None) -> pd.DataFrame:
+    """
+    Load the GWAS summary statistics file.
+
+    Parquet (`.parquet`, `.pq`) and Feather (`.feather`) files are read directly as columnar tables.
+    Text files are read with the multi-threaded polars reader when polars is installed, otherwise with pandas,
+    using the pyarrow CSV engine when pyarrow is installed. The columns are read with the dtypes of `SUMSTAT_SCHEMA`.
+    Gzipped files are decompressed outside of Python's gzip module, see `open_maybe_gz`.
+
+    When `pvalue_threshold` is given, text and Parquet files are filtered while reading, only the SNPs with
+    P-value below the threshold are kept. If there is no such SNP, the most significant SNPs are kept instead,
+    the same fallback as `get_significant_snps`.
+
+    Parameters
+    ----------
+    sumstats_path : Union[str, Path]
+        The path to the GWAS summary statistics file, tab-separated text, Parquet or Feather.
+    pvalue_threshold : Optional[float], optional
+        Only keep the SNPs with P-value below this threshold, by default None
+
+    Returns
+    -------
+    pd.DataFrame
+        The summary statistics.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the file does not exist.
+    """
+    if not os.path.exists(sumstats_path):
+        raise FileNotFoundError(f"No such file: {sumstats_path}")
+    return _read_sumstats(str(sumstats_path), pvalue_threshold)
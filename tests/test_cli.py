@@ -2,10 +2,12 @@
 
 import os
 
+import pandas as pd
 import pytest
 from typer.testing import CliRunner
 
-from easyfinemap.cli import app
+from easyfinemap.__main__ import main
+from easyfinemap.cli import _load_sumstats_for_loci, app
 
 runner = CliRunner()
 PWD = os.path.dirname(os.path.abspath(__file__))
@@ -17,6 +19,16 @@ def test_main():
     assert result.exit_code == 0
 
 
+def test_entry_point():
+    """Test the argparse fast path of the entry point."""
+    with pytest.raises(SystemExit) as exc_info:
+        main(["validate-ldref", "--help"])
+    assert exc_info.value.code == 0
+    with pytest.raises(SystemExit) as exc_info:
+        main(["validate-ldref"])
+    assert exc_info.value.code == 2
+
+
 def test_validate_ldref():
     """Test the validate_ldref command."""
     result = runner.invoke(app, ["validate-ldref", "--help"])
@@ -46,3 +58,20 @@ def test_get_loci():
     assert os.path.exists(f"{PWD}/exampledata/distance.loci.txt")
     result = runner.invoke(app, ["get-loci", "None_file", f"{PWD}/exampledata/distance"])
     assert result.exit_code == 1
+
+
+def test_load_sumstats_for_loci_feather(tmp_path):
+    """Test that only the SNPs within the loci are loaded from a feather file."""
+    sumstats = pd.DataFrame(
+        {
+            "CHR": [1, 1, 1, 1, 2, 2, 3],
+            "BP": [100, 250, 400, 900, 150, 500, 100],
+            "P": [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7],
+        }
+    )
+    sumstats.to_feather(tmp_path / "sumstats.feather")
+    # the first two loci overlap, chromosome 3 has no locus and chromosome 4 has no SNP
+    loci = pd.DataFrame({"CHR": [1, 1, 2, 4], "START": [50, 200, 400, 1], "END": [300, 400, 600, 1000]})
+    loaded = _load_sumstats_for_loci(str(tmp_path / "sumstats.feather"), loci)
+    assert loaded["BP"].tolist() == [100, 250, 400, 500]
+    assert loaded["CHR"].tolist() == [1, 1, 1, 2]
@@ -5,6 +5,7 @@ import shutil
 from pathlib import Path
 import pytest
 
+import numpy as np
 import pandas as pd
 
 from easyfinemap.loci import Loci
@@ -30,3 +31,78 @@ class TestEasyFinemap:
         for file in Path(f"{PWD}/exampledata/").glob("*leadsnp.txt"):
             if file.is_file():
                 os.remove(file)
+
+    def test_finemap_locus_keeps_bp_order_over_cap(self, monkeypatch):
+        """Test that a locus reduced to 5000 SNPs keeps the BP order of the LD matrix."""
+        rng = np.random.default_rng(42)
+        n_snps = 6000
+        sumstats = pd.DataFrame(
+            {
+                ColName.CHR: 1,
+                ColName.BP: np.arange(1, n_snps + 1) * 10,
+                ColName.RSID: [f"rs{i}" for i in range(n_snps)],
+                ColName.EA: "A",
+                ColName.NEA: "G",
+                ColName.P: rng.uniform(1e-10, 1, n_snps),
+                ColName.BETA: rng.normal(0, 0.1, n_snps),
+                ColName.SE: rng.uniform(0.01, 0.1, n_snps),
+                ColName.EAF: rng.uniform(0.05, 0.95, n_snps),
+            }
+        )
+        ld_input = []
+
+        def prepare_ld_matrix(self, sumstats, **kwargs):
+            ld_input.append(sumstats)
+            return sumstats.iloc[:0]
+
+        monkeypatch.setattr(EasyFinemap, "prepare_ld_matrix", prepare_ld_matrix)
+        easyfinemap = EasyFinemap()
+        easyfinemap.finemap_locus(
+            sumstats=sumstats,
+            chrom=1,
+            start=1,
+            end=n_snps * 10,
+            methods=["finemap"],
+            lead_snp=None,
+            max_causal=1,
+            ldref=f"{PWD}/exampledata/LDREF/EUR.chr1",
+        )
+        ld_snps = ld_input[0]
+        assert len(ld_snps) == 5000
+        assert ld_snps[ColName.BP].is_monotonic_increasing
+        assert set(ld_snps[ColName.P]) == set(sumstats[ColName.P].nsmallest(5000))
+
+    def test_run_abf(self):
+        """Test run_abf against the closed-form Wakefield ABF."""
+        beta = np.array([0.1, -0.25, 0.02, 0.4, 0.15])
+        se = np.array([0.05, 0.06, 0.04, 0.1, np.nan])
+        sumstats = pd.DataFrame(
+            {ColName.SNPID: [f"1-{i}-A-G" for i in range(5)], ColName.BETA: beta, ColName.SE: se}
+        )
+        w2 = 0.2**2
+        r = w2 / (se**2 + w2)
+        bf = np.sqrt(1 - r) * np.exp(r * (beta / se) ** 2 / 2)
+        expected = bf / np.nansum(bf)
+        pp = EasyFinemap().run_abf(sumstats, var_prior=0.2)
+        assert pp.index.tolist() == sumstats[ColName.SNPID].tolist()
+        np.testing.assert_allclose(pp.to_numpy()[:4], expected[:4], rtol=1e-12)
+        assert np.isnan(pp.iloc[4])
+        assert pp.sum() == pytest.approx(1)
+        assert sumstats[ColName.BETA].tolist() == beta.tolist()
+
+    def test_get_credset_skips_missing_pp(self):
+        """Test that SNPs without a PP stay out of the credible set when the threshold is not reached."""
+        finemap_res = pd.DataFrame(
+            {
+                ColName.SNPID: [f"1-{i}-A-G" for i in range(5)],
+                "PP_ABF": [0.2, np.nan, 0.5, np.nan, 0.1],
+            }
+        )
+        credible_set = EasyFinemap().get_credset(
+            finemap_res, max_causal=1, credible_threshold=0.95, credible_method="abf"
+        )
+        assert credible_set[ColName.SNPID].tolist() == ["1-2-A-G", "1-0-A-G", "1-4-A-G"]
+        credible_set = EasyFinemap().get_credset(
+            finemap_res, max_causal=1, credible_threshold=0.6, credible_method="abf"
+        )
+        assert credible_set[ColName.SNPID].tolist() == ["1-2-A-G", "1-0-A-G"]
@@ -1,8 +1,23 @@
 """Tests for the utils module."""
 
+import os
+import sys
+
+import numpy as np
+import pandas as pd
 import pytest
 
-from easyfinemap.utils import get_significant_snps, make_SNPID_unique
+from easyfinemap.utils import (
+    get_out_of_bounds,
+    get_significant_snps,
+    io_in_tempdir,
+    load_sumstats,
+    make_SNPID_unique,
+    write_cojo_ma,
+    write_space_sep,
+)
+
+PWD = os.path.dirname(os.path.abspath(__file__))
 
 
 def test_get_significant_snps(sumstats_data):
@@ -11,6 +26,16 @@ def test_get_significant_snps(sumstats_data):
     assert len(sig_df) == 9
 
 
+def test_get_out_of_bounds(sumstats_data):
+    """Test the get_out_of_bounds function."""
+    assert not get_out_of_bounds(sumstats_data).any()
+    sumstats_data.loc[0, "P"] = 0
+    sumstats_data.loc[1, "SE"] = -0.1
+    sumstats_data.loc[2, "CHR"] = 24
+    sumstats_data.loc[3, "EAF"] = 1.5
+    assert get_out_of_bounds(sumstats_data).tolist()[:5] == [True, True, True, True, False]
+
+
 def test_make_SNPID_unique(mock_sumstat):
     """Test the make_SNPID_unique function."""
     mock_sumstat = mock_sumstat[(mock_sumstat["EA"].notnull()) & (mock_sumstat["NEA"].notnull())]
@@ -22,3 +47,105 @@ def test_make_SNPID_unique(mock_sumstat):
     assert len(unique_df3) == 8
     assert "SNPID" in unique_df1.columns
     assert "SNPID" not in unique_df2.columns
+
+
+def test_load_sumstats():
+    """Test the load_sumstats function."""
+    sumstats_path = f"{PWD}/exampledata/noEAF_noMAF.txt.gz"
+    sumstats = load_sumstats(sumstats_path)
+    assert len(sumstats) == 329704
+    assert len(load_sumstats(sumstats_path, 5e-8)) == 9
+    assert len(load_sumstats(sumstats_path, 1e-300)) == 1
+    with pytest.raises(FileNotFoundError):
+        load_sumstats(f"{PWD}/exampledata/not_exist.txt.gz")
+
+
+@pytest.mark.parametrize("suffix", [".txt", ".txt.gz"])
+def test_load_sumstats_missing_values(tmp_path, suffix):
+    """Test that the missing value spellings of pandas are read as NaN, compressed or not."""
+    sumstats = pd.DataFrame(
+        {
+            "CHR": [1, 1, 1],
+            "BP": [100, 200, 300],
+            "rsID": ["rs1", "rs2", "rs3"],
+            "EA": ["A", "A", "C"],
+            "NEA": ["G", "G", "T"],
+            "P": ["0.01", "NA", "1e-9"],
+            "BETA": ["0.1", "nan", ""],
+            "SE": ["0.02", "NA", "0.01"],
+            "EAF": ["0.3", "", "0.1"],
+            "MAF": ["0.3", "0.2", "NA"],
+        }
+    )
+    sumstats_path = tmp_path / f"sumstats{suffix}"
+    sumstats.to_csv(sumstats_path, sep="\t", index=False)
+    loaded = load_sumstats(sumstats_path)
+    assert len(loaded) == 3
+    assert loaded["P"].isna().tolist() == [False, True, False]
+    assert loaded["BETA"].isna().tolist() == [False, True, True]
+    assert loaded["SE"].isna().tolist() == [False, True, False]
+    assert len(load_sumstats(sumstats_path, 5e-8)) == 1
+
+
+@pytest.mark.parametrize("pvalue_threshold", [None, 5e-8])
+def test_load_sumstats_truncated_gz(tmp_path, monkeypatch, pvalue_threshold):
+    """Test that a truncated gzipped file raises EOFError when decompressed by zcat."""
+    monkeypatch.setitem(sys.modules, "isal", None)
+    with open(f"{PWD}/exampledata/noEAF_noMAF.txt.gz", "rb") as f:
+        data = f.read()
+    truncated = tmp_path / "truncated.txt.gz"
+    truncated.write_bytes(data[: len(data) // 2])
+    with pytest.raises(EOFError):
+        load_sumstats(truncated, pvalue_threshold)
+
+
+def test_io_in_tempdir(tmp_path):
+    """Test the io_in_tempdir decorator."""
+
+    @io_in_tempdir(str(tmp_path))
+    def get_temp_dir(temp_dir=None):
+        assert os.path.isdir(temp_dir)
+        return temp_dir
+
+    temp_dir = get_temp_dir()
+    assert os.path.dirname(temp_dir) == str(tmp_path)
+    parent = tmp_path / "locus"
+    parent.mkdir()
+    assert get_temp_dir(temp_dir=str(parent)) == str(parent)
+    assert parent.is_dir()
+
+
+def test_write_cojo_ma(tmp_path):
+    """Test the GCTA-COJO .ma writer."""
+    sumstats = pd.DataFrame(
+        {
+            "SNPID": ["1-100-A-G", "1-200-C-T"],
+            "EA": ["A", "T"],
+            "NEA": ["G", "C"],
+            "EAF": [0.1, 0.25],
+            "BETA": [0.05, -0.2],
+            "SE": [0.01, 0.03],
+            "P": [1e-300, 0.5],
+        }
+    )
+    write_cojo_ma(str(tmp_path / "cojo.ma"), sumstats, 10000)
+    assert (tmp_path / "cojo.ma").read_text().splitlines() == [
+        "SNP A1 A2 freq b se p N",
+        "1-100-A-G A G 0.1 0.05 0.01 1e-300 10000",
+        "1-200-C-T T C 0.25 -0.2 0.03 0.5 10000",
+    ]
+
+
+def test_write_space_sep_missing_values(tmp_path):
+    """Test that write_space_sep writes missing values as empty fields, as to_csv does."""
+    df = pd.DataFrame(
+        {
+            "rsid": ["rs1", None, "rs3"],
+            "position": pd.array([100, pd.NA, 300], dtype="Int64"),
+            "beta": [0.1, np.nan, -0.25],
+        }
+    )
+    path = tmp_path / "missing.txt"
+    write_space_sep(str(path), {col: df[col] for col in df.columns}, ["%s", "%d", "%.6g"])
+    assert path.read_text() == df.to_csv(sep=" ", index=False)
+    assert path.read_text().splitlines() == ["rsid position beta", "rs1 100 0.1", "  ", "rs3 300 -0.25"]